@@ -1,11 +1,21 @@
-from .openpose_editor_nodes import OpenposeEditorNode, PoseBatchLoaderNode, PoseBatchIteratorNode, PoseReferenceLoaderNode, PoseSaverNode
+from .openpose_editor_nodes import OpenposeEditorNode, PoseKeypointTransformNode, PoseBatchLoaderNode, PoseSequenceLoaderNode, PoseBatchIteratorNode, PoseReferenceLoaderNode, PoseSaverNode
 
 
 WEB_DIRECTORY = "js"
 
+# ComfyUI 서버에 에디터용 HTTP 경로를 등록한다 (서버 없이 불러올 때는 건너뛴다)
+try:
+    from server import PromptServer
+    from .pose_server import register_routes
+    register_routes(PromptServer.instance.routes)
+except (ImportError, AttributeError):
+    pass
+
 NODE_CLASS_MAPPINGS = {
     "OpenposeEditorNode": OpenposeEditorNode,
+    "PoseKeypointTransformNode": PoseKeypointTransformNode,
     "PoseBatchLoaderNode": PoseBatchLoaderNode,
+    "PoseSequenceLoaderNode": PoseSequenceLoaderNode,
     "PoseBatchIteratorNode": PoseBatchIteratorNode,
     "PoseReferenceLoaderNode": PoseReferenceLoaderNode,
     "PoseSaverNode": PoseSaverNode,  # Added PoseSaverNode
@@ -13,7 +23,9 @@ NODE_CLASS_MAPPINGS = {
 
 NODE_DISPLAY_NAME_MAPPINGS = {
     "OpenposeEditorNode": "Openpose Editor Node",
+    "PoseKeypointTransformNode": "Pose Keypoint Transform",
     "PoseBatchLoaderNode": "Pose Batch Loader",
+    "PoseSequenceLoaderNode": "Pose Sequence Loader",
     "PoseBatchIteratorNode": "Pose Batch Iterator",
     "PoseReferenceLoaderNode": "Pose Reference Loader",
     "PoseSaverNode": "Pose Saver",  # Added PoseSaverNode
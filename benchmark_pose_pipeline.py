@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the pose rendering pipeline.
+
+Sweeps frame count, people per frame, face/hand presence, output resolution, retargeting and the
+draw_pose_json execution options, reporting frames/s and peak traced memory for each case, plus
+micro benchmarks of draw_pose / draw_bodypose / draw_handpose / draw_facepose.
+
+    python benchmark_pose_pipeline.py                          # run and print
+    python benchmark_pose_pipeline.py --save-baseline base.json
+    python benchmark_pose_pipeline.py --compare base.json      # exit 1 on regressions
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+
+# Stub ComfyUI's ProgressBar when running outside of ComfyUI
+try:
+    import comfy.utils
+except ImportError:
+    class MockProgressBar:
+        def __init__(self, total):
+            self.total = total
+        def update(self, n):
+            pass
+        def update_absolute(self, value, total=None):
+            pass
+
+    sys.modules['comfy'] = type('MockModule', (), {})()
+    sys.modules['comfy.utils'] = type('MockModule', (), {'ProgressBar': MockProgressBar})()
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import numpy as np
+from util import draw_pose_json, draw_pose, draw_bodypose, draw_handpose, draw_facepose
+
+CANVAS_W, CANVAS_H = 512, 768
+
+# Standing COCO-18 figure on a 512x768 canvas
+BASE_BODY = [
+    (256, 150), (256, 210), (206, 212), (186, 300), (176, 380), (306, 212), (326, 300), (336, 380), (226, 400),
+    (224, 530), (222, 660), (286, 400), (288, 530), (290, 660), (244, 138), (268, 138), (232, 146), (280, 146),
+]
+
+DEFAULT_PARAMS = dict(
+    resolution_x=-1, use_ground_plane=True, show_body=True, show_face=True, show_hands=True,
+    pose_marker_size=4, face_marker_size=3, hand_marker_size=2,
+    pelvis_scale=1.1, torso_scale=1.0, neck_scale=1.0, head_scale=1.2, eye_distance_scale=1.0, eye_height=0.0, eyebrow_height=0.0,
+    left_eye_scale=1.0, right_eye_scale=1.0, left_eyebrow_scale=1.0, right_eyebrow_scale=1.0,
+    mouth_scale=1.0, nose_scale_face=1.0, face_shape_scale=1.0,
+    shoulder_scale=1.0, arm_scale=1.1, leg_scale=1.0, hands_scale=1.0, overall_scale=0.9,
+)
+
+PARAM_ORDER = [
+    "resolution_x", "use_ground_plane", "show_body", "show_face", "show_hands",
+    "pose_marker_size", "face_marker_size", "hand_marker_size",
+    "pelvis_scale", "torso_scale", "neck_scale", "head_scale", "eye_distance_scale", "eye_height", "eyebrow_height",
+    "left_eye_scale", "right_eye_scale", "left_eyebrow_scale", "right_eyebrow_scale",
+    "mouth_scale", "nose_scale_face", "face_shape_scale",
+    "shoulder_scale", "arm_scale", "leg_scale", "hands_scale", "overall_scale",
+]
+
+def make_person(rng, dx, dy, face, hands):
+    jitter = lambda: rng.uniform(-6, 6)
+    body = [(x + dx + jitter(), y + dy + jitter()) for x, y in BASE_BODY]
+    person = {"pose_keypoints_2d": [v for x, y in body for v in (x, y, 1.0)]}
+
+    nose_x, nose_y = body[0]
+    face_points = [(nose_x + 28 * math.cos(2 * math.pi * i / 70) + jitter() / 3, nose_y + 34 * math.sin(2 * math.pi * i / 70) + jitter() / 3) for i in range(70)]
+    person["face_keypoints_2d"] = [v for x, y in face_points for v in (x, y, 1.0)] if face else []
+
+    for key, wrist in (("hand_left_keypoints_2d", body[7]), ("hand_right_keypoints_2d", body[4])):
+        hand_points = [(wrist[0] + (i % 5) * 6 + jitter() / 3, wrist[1] + (i // 5) * 7 + jitter() / 3) for i in range(21)]
+        person[key] = [v for x, y in hand_points for v in (x, y, 1.0)] if hands else []
+    return person
+
+def make_frames(frames, people, face=True, hands=True, seed=0):
+    rng = random.Random(seed)
+    data = []
+    for _ in range(frames):
+        figures = [make_person(rng, rng.uniform(-150, 150), rng.uniform(-40, 40), face, hands) for _ in range(people)]
+        data.append({"people": figures, "canvas_width": CANVAS_W, "canvas_height": CANVAS_H})
+    return data
+
+def timed(fn, repeat):
+    """Best wall time of repeat runs, and peak traced memory of the first run."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    best = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best, peak
+
+def pipeline_cases(quick):
+    base = dict(frames=20 if quick else 60, people=1, face=True, hands=True, resolution_x=-1, retarget=False, options={})
+    sweeps = [
+        ("frames", [5, 200] if not quick else [5, 60]),
+        ("people", [4, 16] if not quick else [4]),
+        ("face", [False]),
+        ("hands", [False]),
+        ("resolution_x", [1024, 2048] if not quick else [1024]),
+        ("retarget", [True]),
+        ("options", [{"batch_mode": True}, {"render_images": False}, {"use_stamp_cache": True}, {"render_workers": 0}, {"preview_width": 256}]),
+    ]
+    cases = [("base", base)]
+    for key, values in sweeps:
+        for value in values:
+            case = dict(base, **{key: value})
+            label = ",".join(f"{k}={v}" for k, v in value.items()) if key == "options" else f"{key}={value}"
+            cases.append((label, case))
+    return cases
+
+def run_pipeline_case(case, repeat):
+    frames = make_frames(case["frames"], case["people"], case["face"], case["hands"])
+    pose_json_str = json.dumps(frames)
+    params = dict(DEFAULT_PARAMS, resolution_x=case["resolution_x"])
+    target = make_frames(1, 1, seed=99) if case["retarget"] else None
+    # retargeted body scaled up a little, so the ratios are not all 1
+    if target:
+        target[0]["people"][0]["pose_keypoints_2d"] = [v * 1.15 if i % 3 != 2 else v for i, v in enumerate(target[0]["people"][0]["pose_keypoints_2d"])]
+    args = [params[name] for name in PARAM_ORDER]
+    seconds, peak = timed(lambda: draw_pose_json(pose_json_str, *args, target_pose_keypoint_obj=target, **case["options"]), repeat)
+    return {"fps": case["frames"] / seconds, "seconds": seconds, "peak_mb": peak / 2**20}
+
+def micro_cases(quick):
+    rng = random.Random(1)
+    people = 4
+    figures = [make_person(rng, rng.uniform(-150, 150), 0, True, True) for _ in range(people)]
+    scale = np.array([CANVAS_W, CANVAS_H], dtype=float)
+    candidate = np.concatenate([np.array(p["pose_keypoints_2d"]).reshape(-1, 3)[:, :2] / scale for p in figures])
+    subset = np.array([[n * 18 + i for i in range(18)] for n in range(people)])
+    hands = [(np.array(p[k]).reshape(-1, 3)[:, :2] / scale).tolist() for p in figures for k in ("hand_left_keypoints_2d", "hand_right_keypoints_2d")]
+    faces = np.concatenate([np.array(p["face_keypoints_2d"]).reshape(-1, 3)[:, :2] / scale for p in figures]).tolist()
+    pose = dict(bodies=dict(candidate=candidate.tolist(), subset=subset.tolist()), faces=faces, hands=hands)
+    canvas = lambda: np.zeros((CANVAS_H, CANVAS_W, 3), dtype=np.uint8)
+    count = 20 if quick else 100
+    return count, [
+        ("draw_pose", lambda: draw_pose(pose, CANVAS_H, CANVAS_W, 4, 3, 2)),
+        ("draw_bodypose", lambda: draw_bodypose(canvas(), candidate, subset, 4)),
+        ("draw_handpose", lambda: draw_handpose(canvas(), hands, 2)),
+        ("draw_facepose", lambda: draw_facepose(canvas(), faces, 3)),
+    ]
+
+def run_all(quick, repeat):
+    results = {}
+    for label, case in pipeline_cases(quick):
+        result = run_pipeline_case(case, repeat)
+        results[f"draw_pose_json[{label}]"] = result
+        print(f"draw_pose_json[{label}]: {result['fps']:.1f} frames/s, peak {result['peak_mb']:.1f} MB")
+
+    count, micro = micro_cases(quick)
+    for name, fn in micro:
+        seconds, peak = timed(lambda: [fn() for _ in range(count)], repeat)
+        results[f"{name}[4 people]"] = {"fps": count / seconds, "seconds": seconds, "peak_mb": peak / 2**20}
+        print(f"{name}[4 people]: {count / seconds:.1f} calls/s, peak {peak / 2**20:.1f} MB")
+    return results
+
+def compare(results, baseline, tolerance):
+    """Print cases whose throughput fell more than tolerance below the baseline; return how many did."""
+    regressions = 0
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None: continue
+        change = result["fps"] / base["fps"] - 1.0
+        if change < -tolerance:
+            regressions += 1
+            print(f"REGRESSION {name}: {base['fps']:.1f} -> {result['fps']:.1f} ({change:+.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="smaller sweep for a fast smoke run")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the best time is kept")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the results to a baseline file")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed throughput drop before a case counts as a regression")
+    args = parser.parse_args()
+
+    results = run_all(args.quick, max(1, args.repeat))
+
+    if args.save_baseline:
+        baseline = {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(), "quick": args.quick, "results": results}
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        print(f"{regressions} regression(s) against {args.compare}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
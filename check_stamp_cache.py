@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Accuracy check for the stamp-cache rendering mode.
+
+Renders the bundled pose files (plus jittered copies of them) with and without use_stamp_cache and
+reports how many pixels differ. Cached limb polygons are translated copies of the ones cv2 would
+compute, so the only expected differences are single pixels where cv2 rounds an exact .5 offset.
+"""
+
+import sys
+import os
+import glob
+import json
+import random
+import numpy as np
+
+# Mock ComfyUI's ProgressBar so util.py can be imported outside of ComfyUI
+class MockProgressBar:
+    def __init__(self, total):
+        self.total = total
+    def update(self, n):
+        pass
+
+sys.modules['comfy'] = type('MockModule', (), {})()
+sys.modules['comfy.utils'] = type('MockModule', (), {'ProgressBar': MockProgressBar})()
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from util import draw_pose_json
+
+# Fraction of differing pixels above which the check fails
+MAX_DIFF_RATIO = 1e-3
+
+def jitter_frames(frames, rng, people=3):
+    """Copy each frame, spreading a few jittered duplicates of the first person across the canvas."""
+    jittered = []
+    for frame in frames:
+        frame = json.loads(json.dumps(frame))
+        base = frame['people'][0]
+        for _ in range(people - 1):
+            dx, dy = rng.uniform(-150, 150), rng.uniform(-150, 150)
+            person = {}
+            for key, kps in base.items():
+                kps = list(kps or [])
+                for i in range(0, len(kps) - 2, 3):
+                    if kps[i + 2] > 0:
+                        kps[i] += dx + rng.uniform(-5, 5)
+                        kps[i + 1] += dy + rng.uniform(-5, 5)
+                person[key] = kps
+            frame['people'].append(person)
+        jittered.append(frame)
+    return jittered
+
+def render(pose_json_str, resolution_x, marker_size, use_stamp_cache):
+    pose_imgs, _ = draw_pose_json(
+        pose_json_str, resolution_x, True, True, True, True,
+        marker_size, max(1, marker_size - 1), 2,
+        1.0, 1.0, 1.0, 1.0, 1.0, 0.0, 0.0,
+        1.0, 1.0, 1.0, 1.0,
+        1.0, 1.0, 1.0,
+        1.0, 1.0, 1.0, 1.0, 1.0,
+        use_stamp_cache=use_stamp_cache
+    )
+    return pose_imgs
+
+def main():
+    here = os.path.dirname(os.path.abspath(__file__))
+    files = sorted(glob.glob(os.path.join(here, 'converted', '*.json')))
+    if not files:
+        print("No pose files found in converted/")
+        return 1
+
+    frames = []
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        frames.extend(data if isinstance(data, list) else [data])
+
+    rng = random.Random(0)
+    total_pixels, diff_pixels = 0, 0
+    for resolution_x in (-1, 512, 1536):
+        for marker_size in (1, 4, 9):
+            pose_json_str = json.dumps(jitter_frames(frames, rng))
+            reference = render(pose_json_str, resolution_x, marker_size, False)
+            stamped = render(pose_json_str, resolution_x, marker_size, True)
+            for ref_img, stamped_img in zip(reference, stamped):
+                total_pixels += ref_img.shape[0] * ref_img.shape[1]
+                diff_pixels += int(np.any(ref_img != stamped_img, axis=-1).sum())
+            print(f"resolution_x={resolution_x:5d} marker={marker_size}: {diff_pixels}/{total_pixels} differing pixels so far")
+
+    ratio = diff_pixels / max(total_pixels, 1)
+    print(f"Differing pixel ratio: {ratio:.2e} (limit {MAX_DIFF_RATIO:.0e})")
+    return 0 if ratio <= MAX_DIFF_RATIO else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
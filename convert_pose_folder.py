@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Convert a folder of pose JSON files into one .poseseq file for the Pose Sequence Loader node.
+
+The .poseseq file stores every keypoint in one float32 array with offsets for frames, people and body parts,
+plus canvas sizes and source filenames, so the loader can memory-map it and jump to any frame.
+
+    python convert_pose_folder.py converted poses.poseseq
+    python convert_pose_folder.py converted poses.poseseq --pattern "frame_*.json" --natural-sort
+    python convert_pose_folder.py converted poses.poseseq --float64   # exact round trip, twice the size
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from pose_sequence import convert_pose_folder
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", help="folder holding the pose JSON files")
+    parser.add_argument("output", help="path of the .poseseq file to write")
+    parser.add_argument("--pattern", default="*.json", help="file pattern inside the folder (default *.json)")
+    parser.add_argument("--natural-sort", action="store_true", help="order frame_2 before frame_10")
+    parser.add_argument("--float64", action="store_true", help="store keypoints as float64 instead of float32")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.folder):
+        parser.error(f"folder '{args.folder}' does not exist")
+
+    start = time.perf_counter()
+    frames, files, skipped = convert_pose_folder(args.folder, args.output, args.pattern, args.natural_sort,
+                                                 "float64" if args.float64 else "float32")
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {frames} frames from {files} files to {args.output} "
+          f"({os.path.getsize(args.output) / 1024:.1f} KB, {elapsed:.2f}s)" + (f", skipped {skipped} files" if skipped else ""))
+    return 1 if skipped else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -54,7 +54,9 @@ app.registerExtension({
 			const onExecuted = nodeType.prototype.onExecuted;
 			nodeType.prototype.onExecuted = function (message) {
 				onExecuted?.apply(this, arguments);
-				populate.call(this, message.POSE_JSON);
+				// POSE_SUMMARY is sent when only the first frames are shown; the editor then fetches the full JSON
+				this.poseJsonTruncated = !!message.POSE_SUMMARY;
+				populate.call(this, [...message.POSE_JSON, ...(message.POSE_SUMMARY ?? []), ...(message.PROFILE ?? [])]);
 			};
 
 			const onConfigure = nodeType.prototype.onConfigure;
@@ -1,6 +1,7 @@
 import { app } from "../../scripts/app.js";
 import { ComfyDialog, $el } from "../../scripts/ui.js";
 import { ComfyApp } from "../../scripts/app.js";
+import { api } from "../../scripts/api.js";
 
 
 function addMenuHandler(nodeType, cb) {
@@ -84,7 +85,8 @@ class OpenposeEditorDialog extends ComfyDialog {
         if (targetNode.inputs?.[0].link || targetNode.inputs?.[targetNode.inputs.length-1].widget){
             const textAreaElement = targetNode.widgets[8].element;
             this.element.style.display = "flex";
-            this.setCanvasJSONString(textAreaElement.value.replace(/'/g, '"'));
+            const fullJSON = targetNode.poseJsonTruncated ? await this.fetchFullPoseJSON(targetNode) : null;
+            this.setCanvasJSONString((fullJSON ?? textAreaElement.value).replace(/'/g, '"'));
         } else {
             const textAreaElement = targetNode.widgets[7].element;
             this.element.style.display = "flex";
@@ -141,6 +143,17 @@ class OpenposeEditorDialog extends ComfyDialog {
         });
     }
 
+    // The node's UI output only holds the first frames of long batches; the server keeps the full JSON
+    async fetchFullPoseJSON(node) {
+        try {
+            const response = await api.fetchApi(`/ultimate-openpose/pose_json?node_id=${encodeURIComponent(node.id)}`);
+            return response.ok ? await response.text() : null;
+        } catch (error) {
+            console.warn("Could not fetch the full pose JSON", error);
+            return null;
+        }
+    }
+
     setCanvasJSONString(jsonString) {
         this.iframeElement.contentWindow.postMessage({
             modalId: 0,
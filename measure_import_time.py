@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Measure how long ComfyUI takes to load this custom node package, and what it costs on first execution.
+
+Each run starts a fresh interpreter, loads the package from __init__.py the way ComfyUI does, then imports
+util the way the first node execution does. The heavy modules already loaded at each point are listed.
+
+    python measure_import_time.py               # median of 5 runs
+    python measure_import_time.py --importtime  # also show the slowest modules from python -X importtime
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+HEAVY_MODULES = ["torch", "numpy", "cv2", "matplotlib", "comfy.utils"]
+
+# 새 인터프리터에서 실행되는 측정 코드 (comfy.utils가 없으면 ProgressBar만 흉내 낸다)
+RUN_CODE = r'''
+import sys, json, time, importlib.util
+try:
+    import comfy.utils
+except ImportError:
+    sys.modules['comfy'] = type('MockModule', (), {})()
+    sys.modules['comfy.utils'] = type('MockModule', (), {'ProgressBar': object})()
+package_dir, heavy = sys.argv[1], json.loads(sys.argv[2])
+loaded = lambda: [name for name in heavy if name in sys.modules and not isinstance(sys.modules[name], type)]
+preloaded = loaded()
+
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("openpose_package", package_dir + "/__init__.py", submodule_search_locations=[package_dir])
+module = importlib.util.module_from_spec(spec)
+sys.modules["openpose_package"] = module
+spec.loader.exec_module(module)
+for node in module.NODE_CLASS_MAPPINGS.values():
+    node.INPUT_TYPES() # ComfyUI도 노드 목록을 만들 때 호출한다
+register_seconds = time.perf_counter() - start
+after_register = loaded()
+
+start = time.perf_counter()
+importlib.import_module("openpose_package.util")
+first_run_seconds = time.perf_counter() - start
+print(json.dumps({"register": register_seconds, "first_run": first_run_seconds, "preloaded": preloaded,
+                  "after_register": after_register, "after_first_run": loaded(), "nodes": len(module.NODE_CLASS_MAPPINGS)}))
+'''
+
+def run_once(extra_args=()):
+    result = subprocess.run([sys.executable, *extra_args, "-c", RUN_CODE, PACKAGE_DIR, json.dumps(HEAVY_MODULES)],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f"Loading the package failed:\n{result.stderr.strip().splitlines()[-1]}")
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+def slowest_imports(stderr, top):
+    """Parse python -X importtime output into (cumulative microseconds, module) sorted by cost."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line: continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        rows.append((int(cumulative_us), name))
+    return sorted(rows, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to measure; the median is reported")
+    parser.add_argument("--importtime", action="store_true", help="show the slowest modules from python -X importtime")
+    parser.add_argument("--top", type=int, default=15, help="modules to show with --importtime")
+    args = parser.parse_args()
+
+    runs = [run_once()[0] for _ in range(max(1, args.runs))]
+    last = runs[-1]
+    print(f"Registering {last['nodes']} nodes: {statistics.median(r['register'] for r in runs) * 1000:.1f} ms (median of {len(runs)})")
+    print(f"  heavy modules loaded by the package: {', '.join(m for m in last['after_register'] if m not in last['preloaded']) or 'none'}")
+    print(f"First node execution imports: {statistics.median(r['first_run'] for r in runs) * 1000:.1f} ms")
+    print(f"  heavy modules loaded by then: {', '.join(m for m in last['after_first_run'] if m not in last['preloaded']) or 'none'}")
+    if last["preloaded"]:
+        print(f"  (already imported before the package, as ComfyUI would: {', '.join(last['preloaded'])})")
+
+    if args.importtime:
+        _, stderr = run_once(["-X", "importtime"])
+        print("\nSlowest imports (cumulative):")
+        for cumulative_us, name in slowest_imports(stderr, args.top):
+            print(f"{cumulative_us / 1000:>10.1f} ms  {name}")
+
+if __name__ == "__main__":
+    main()
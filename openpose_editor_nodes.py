@@ -1,12 +1,92 @@
 import json
-import torch
-import numpy as np
 import os
-import glob
-from .util import draw_pose_json, draw_pose
+# util(numpy, cv2, comfy.utils)과 torch는 ComfyUI 시작 시간을 줄이기 위해 노드가 처음 실행될 때 불러온다
+from .pose_cache import content_hash, editor_result_cache, pose_stage_cache, parsed_pose_store, pose_json_sources
+from .pose_profiler import StageProfiler, profile_stage
+from .pose_constants import RETARGET_MODES
+from .pose_io import list_pose_files, pose_prefetcher, write_json_atomic, append_json_lines, pose_file_writer
 
 OpenposeJSON = dict
 
+def apply_canvas_defaults(frame):
+    """Return the frame with default canvas dimensions, copying the dict only when a key is missing."""
+    if not isinstance(frame, dict) or ('canvas_width' in frame and 'canvas_height' in frame):
+        return frame
+    frame = dict(frame)
+    frame.setdefault('canvas_width', 512)
+    frame.setdefault('canvas_height', 768)
+    return frame
+
+def prepare_pose_input(POSE_JSON, POSE_KEYPOINT=None):
+    """
+    Turn the node's POSE_KEYPOINT / POSE_JSON inputs into a list of frame dicts with canvas dimensions filled in.
+    POSE_KEYPOINT objects are used as they are; only the POSE_JSON widget string gets parsed.
+    Inputs registered in parsed_pose_store (by a loader or an earlier call) return the stored frames directly.
+    Returns None when there is no usable input.
+    """
+    # 팔 길이 비교를 위해 POSE_KEYPOINT가 우선순위를 갖도록 순서 조정
+    if POSE_KEYPOINT is None and not POSE_JSON:
+        return None
+    stored = parsed_pose_store.lookup(POSE_KEYPOINT if POSE_KEYPOINT is not None else POSE_JSON)
+    if stored is not None:
+        return stored[1]
+
+    if POSE_KEYPOINT is not None:
+        pose_data = POSE_KEYPOINT
+    else:
+        temp_json = POSE_JSON.replace("'",'"').replace('None','[]')
+        try:
+            pose_data = json.loads(temp_json)
+        except json.JSONDecodeError as e:
+            print(f"Error parsing JSON: {e}")
+            return None
+
+    frames = normalize_pose_frames(pose_data)
+    # 같은 입력을 받는 다른 노드가 다시 파싱/해시하지 않도록 등록해 둔다
+    parsed_pose_store.register(frames, source=POSE_KEYPOINT, text=POSE_JSON if POSE_KEYPOINT is None else None)
+    return frames
+
+def normalize_pose_frames(pose_data):
+    """List of frame dicts with canvas dimensions, without modifying the upstream node's output."""
+    if not isinstance(pose_data, list):
+        pose_data = [pose_data]
+    return [apply_canvas_defaults(frame) for frame in pose_data]
+
+def format_pose_json(pose_data, compact=False):
+    """POSE_JSON string of pose_data: indented like the original output, or compact without whitespace."""
+    return json.dumps(pose_data, separators=(',', ':')) if compact else json.dumps(pose_data, indent=4)
+
+def estimate_pose_bytes(pose_data):
+    """Approximate memory held by a POSE_KEYPOINT frame list's Python objects (dicts, lists and numbers)."""
+    # float 하나가 목록 칸(8)과 객체(24)로 약 32바이트, dict/list 머리가 수백 바이트를 차지한다
+    total = 0
+    for frame in pose_data if isinstance(pose_data, list) else [pose_data]:
+        total += 640
+        for person in (frame.get('people') or []) if isinstance(frame, dict) else []:
+            total += 640
+            if isinstance(person, dict):
+                total += sum(64 + 32 * len(values) for values in person.values() if isinstance(values, list))
+    return total
+
+def pose_json_ui(keypoints, json_str, preview_frames, compact=False):
+    """
+    UI payload for the POSE_JSON display: the whole JSON when the batch has at most preview_frames frames,
+    otherwise only the first preview_frames frames plus a POSE_SUMMARY line; the editor then fetches the
+    full JSON from the server when it opens.
+    """
+    if len(keypoints) <= preview_frames:
+        return {"POSE_JSON": [json_str]}
+    preview = format_pose_json(keypoints[:preview_frames], compact) if preview_frames > 0 else ""
+    people = sum(len(frame.get('people') or []) for frame in keypoints if isinstance(frame, dict))
+    summary = f"Showing {preview_frames} of {len(keypoints)} frames ({people} people in total). Opening the editor loads every frame."
+    return {"POSE_JSON": [preview], "POSE_SUMMARY": [summary]}
+
+def register_pose_output(pose_data, json_str):
+    """Register a node's POSE_KEYPOINT output and its POSE_JSON string so downstream nodes reuse the parse."""
+    if pose_data is not None:
+        parsed_pose_store.register(normalize_pose_frames(pose_data), source=pose_data, text=json_str)
+
+
 class OpenposeEditorNode:
     @classmethod
     def INPUT_TYPES(s):
@@ -44,7 +124,18 @@ class OpenposeEditorNode:
                 "POSE_JSON": ("STRING", {"multiline": True}),
                 "POSE_KEYPOINT": ("POSE_KEYPOINT",{"default": None}),
                 "Target_pose_keypoint": ("POSE_KEYPOINT", {"default": None}),
+                "batch_mode": ("BOOLEAN", {"default": False}),
+                "render_workers": ("INT", {"default": 1, "min": 0, "max": 256}),
+                "use_stamp_cache": ("BOOLEAN", {"default": False}),
+                "result_cache_mb": ("INT", {"default": 512, "min": 0, "max": 65536}),
+                "profile_stages": (["off", "time", "time+memory"], {"default": "off"}),
+                "retarget_mode": (list(RETARGET_MODES), {"default": "first_person"}),
+                "draft_preview": ("BOOLEAN", {"default": False}),
+                "draft_width": ("INT", {"default": 512, "min": 64, "max": 4096}),
+                "compact_json": ("BOOLEAN", {"default": False}),
+                "ui_preview_frames": ("INT", {"default": 16, "min": 0, "max": 100000}),
             },
+            "hidden": {"unique_id": "UNIQUE_ID"},
         }
 
     RETURN_NAMES = ("POSE_IMAGE", "POSE_KEYPOINT", "POSE_JSON")
@@ -53,86 +144,180 @@ class OpenposeEditorNode:
     FUNCTION = "load_pose"
     CATEGORY = "ultimate-openpose"
 
+    # 결과에 영향을 주지 않아 캐시 키에서 제외하는 입력
+    NON_RESULT_INPUTS = ("batch_mode", "render_workers", "result_cache_mb", "profile_stages", "unique_id")
+
+    @classmethod
+    def result_cache_key(s, inputs):
+        """Content hash of the input pose, target pose and every parameter that changes the result."""
+        # IS_CHANGED에서도 불리므로 부작용 없이 해시만 계산한다 (이미 등록된 JSON 문자열은 등록된 키로, 객체는 내용으로 해시된다)
+        key_inputs = {name: parsed_pose_store.token(value) for name, value in inputs.items() if name not in s.NON_RESULT_INPUTS}
+        return content_hash(key_inputs)
+
+    @classmethod
+    def IS_CHANGED(s, **kwargs):
+        return s.result_cache_key(kwargs)
+
     def load_pose(self, show_body, show_face, show_hands, resolution_x, use_ground_plane,
                   pose_marker_size, face_marker_size, hand_marker_size,
                   pelvis_scale, torso_scale, neck_scale, head_scale, eye_distance_scale, eye_height, eyebrow_height,
                   left_eye_scale, right_eye_scale, left_eyebrow_scale, right_eyebrow_scale,
                   mouth_scale, nose_scale_face, face_shape_scale,
                   shoulder_scale, arm_scale, leg_scale, hands_scale, overall_scale,
-                  POSE_JSON: str, POSE_KEYPOINT=None, Target_pose_keypoint=None) -> tuple[OpenposeJSON]:
-        
+                  POSE_JSON: str, POSE_KEYPOINT=None, Target_pose_keypoint=None, batch_mode=False, render_workers=1, use_stamp_cache=False,
+                  result_cache_mb=512, profile_stages="off", retarget_mode="first_person", draft_preview=False, draft_width=512,
+                  compact_json=False, ui_preview_frames=16, unique_id=None) -> tuple[OpenposeJSON]:
+        """
+        Render the pose, reusing a previous result when the same pose data and parameters were seen before.
+        With profile_stages the result cache is bypassed and a per-stage timing report is added to the UI output.
+        The UI shows at most ui_preview_frames frames; when it holds fewer than the batch, the full keypoints stay
+        available to the editor by node id.
+        """
+        inputs = {name: value for name, value in locals().items() if name != "self"}
+        render_inputs = {name: value for name, value in inputs.items() if name not in ("result_cache_mb", "profile_stages", "unique_id")}
+        output = self.cached_render(inputs, render_inputs, result_cache_mb, profile_stages)
+        if unique_id is not None:
+            keypoints = output["result"][1]
+            if len(keypoints) > ui_preview_frames:
+                # UI에 일부만 보낸 경우에만, 에디터가 열릴 때 전체 JSON을 서버에서 가져갈 수 있도록 남겨 둔다
+                pose_json_sources.put(str(unique_id), (keypoints, compact_json), estimate_pose_bytes(keypoints))
+            else:
+                pose_json_sources.pop(str(unique_id))
+        return output
+
+    def cached_render(self, inputs, render_inputs, result_cache_mb, profile_stages):
+        """render_pose through the result cache, or with a stage profiler when profile_stages is on."""
+        if profile_stages != "off":
+            # 캐시를 거치지 않고 전체 파이프라인을 측정한다
+            with StageProfiler(trace_memory=profile_stages == "time+memory") as profiler:
+                output = self.render_pose(**render_inputs, profiler=profiler)
+            report = profiler.format_report()
+            print(f"OpenposeEditorNode stage profile:\n{report}")
+            output["ui"]["PROFILE"] = [report]
+            output["ui"]["PROFILE_REPORT"] = [profiler.report()]
+            return output
+
+        if result_cache_mb <= 0:
+            return self.render_pose(**render_inputs)
+
+        editor_result_cache.resize(result_cache_mb * 1024 * 1024)
+        # 실행 중에는 입력 포즈를 등록해 두어 POSE_JSON 문자열의 해시와 이후 파싱을 반복하지 않게 한다
+        prepare_pose_input(inputs.get("POSE_JSON"), inputs.get("POSE_KEYPOINT"))
+        cache_key = self.result_cache_key(inputs)
+        output = editor_result_cache.get(cache_key)
+        if output is None:
+            # 결과가 캐시에 없어도 바뀌지 않은 단계(파싱, 몸/얼굴/손 변환 등)는 단계별 캐시에서 재사용한다
+            output = self.render_pose(**render_inputs, stage_cache=pose_stage_cache)
+            image_tensor, keypoints, json_str = output["result"]
+            editor_result_cache.put(cache_key, output, image_tensor.nbytes + len(json_str) + estimate_pose_bytes(keypoints))
+        return output
+
+    def render_pose(self, show_body, show_face, show_hands, resolution_x, use_ground_plane,
+                    pose_marker_size, face_marker_size, hand_marker_size,
+                    pelvis_scale, torso_scale, neck_scale, head_scale, eye_distance_scale, eye_height, eyebrow_height,
+                    left_eye_scale, right_eye_scale, left_eyebrow_scale, right_eyebrow_scale,
+                    mouth_scale, nose_scale_face, face_shape_scale,
+                    shoulder_scale, arm_scale, leg_scale, hands_scale, overall_scale,
+                    POSE_JSON: str, POSE_KEYPOINT=None, Target_pose_keypoint=None, batch_mode=False, render_workers=1, use_stamp_cache=False,
+                    retarget_mode="first_person", draft_preview=False, draft_width=512, compact_json=False, ui_preview_frames=16,
+                    profiler=None, stage_cache=None):
+        import numpy as np
+        import torch
+        from .util import draw_pose_json, draw_pose, get_render_size
+
         # 내부 함수인 process_pose에 Target_pose_keypoint를 전달하도록 수정
-        def process_pose(pose_input_str_list, target_pose_obj=None):
+        def process_pose(pose_frames, target_pose_obj=None):
             pose_imgs, final_keypoints_batch = draw_pose_json(
-                pose_input_str_list, resolution_x, use_ground_plane, show_body, show_face, show_hands,
+                pose_frames, resolution_x, use_ground_plane, show_body, show_face, show_hands,
                 pose_marker_size, face_marker_size, hand_marker_size,
                 pelvis_scale, torso_scale, neck_scale, head_scale, eye_distance_scale, eye_height, eyebrow_height,
                 left_eye_scale, right_eye_scale, left_eyebrow_scale, right_eyebrow_scale,
                 mouth_scale, nose_scale_face, face_shape_scale,
                 shoulder_scale, arm_scale, leg_scale, hands_scale, overall_scale,
-                target_pose_keypoint_obj=target_pose_obj # util.py 함수로 Target_pose_keypoint 전달
+                target_pose_keypoint_obj=target_pose_obj, # util.py 함수로 Target_pose_keypoint 전달
+                batch_mode=batch_mode, render_workers=render_workers, use_stamp_cache=use_stamp_cache,
+                output_dtype=np.float32, # 이미지를 미리 할당된 float32 배치에 바로 기록
+                profiler=profiler, retarget_mode=retarget_mode, stage_cache=stage_cache,
+                preview_width=draft_width if draft_preview else 0 # 초안 모드는 해상도와 관계없이 작은 이미지로 그린다
             )
             
-            if not pose_imgs: return None, None, None
-            
-            pose_imgs_np = np.array(pose_imgs).astype(np.float32) / 255
-            final_json_str = json.dumps(final_keypoints_batch, indent=4)
-            return torch.from_numpy(pose_imgs_np), final_keypoints_batch, final_json_str
-
-        input_json_str = ""
-        # 팔 길이 비교를 위해 POSE_KEYPOINT가 우선순위를 갖도록 순서 조정
-        if POSE_KEYPOINT is not None:
-            normalized_json_data = json.dumps(POSE_KEYPOINT, indent=4).replace("'",'"').replace('None','[]')
-            if not isinstance(POSE_KEYPOINT, list):
-                input_json_str = f'[{normalized_json_data}]'
-            else:
-                input_json_str = normalized_json_data
-        elif POSE_JSON: 
-            temp_json = POSE_JSON.replace("'",'"').replace('None','[]')
-            try:
-                parsed_json = json.loads(temp_json)
-                input_json_str = f"[{temp_json}]" if not isinstance(parsed_json, list) else temp_json
-            except json.JSONDecodeError: input_json_str = f"[{temp_json}]"
-        
-        if input_json_str:
-            # Ensure canvas dimensions are present in the JSON data
-            try:
-                parsed_data = json.loads(input_json_str)
-                if isinstance(parsed_data, list):
-                    for item in parsed_data:
-                        if isinstance(item, dict):
-                            if 'canvas_width' not in item:
-                                item['canvas_width'] = 512
-                            if 'canvas_height' not in item:
-                                item['canvas_height'] = 768
-                else:
-                    if isinstance(parsed_data, dict):
-                        if 'canvas_width' not in parsed_data:
-                            parsed_data['canvas_width'] = 512
-                        if 'canvas_height' not in parsed_data:
-                            parsed_data['canvas_height'] = 768
-                        parsed_data = [parsed_data]
-                input_json_str = json.dumps(parsed_data)
-            except json.JSONDecodeError:
-                # If parsing fails, just continue with original string
-                pass
+            if len(pose_imgs) == 0: return None, None, None
             
+            with profile_stage(profiler, "tensor"):
+                pose_imgs_np = pose_imgs if isinstance(pose_imgs, np.ndarray) else np.stack(pose_imgs)
+                image_tensor = torch.from_numpy(pose_imgs_np)
+            with profile_stage(profiler, "json_output"):
+                final_json_str = format_pose_json(final_keypoints_batch, compact_json)
+            return image_tensor, final_keypoints_batch, final_json_str
+
+        with profile_stage(profiler, "input"):
+            pose_frames = prepare_pose_input(POSE_JSON, POSE_KEYPOINT)
+        if pose_frames:
             # process_pose 호출 시 Target_pose_keypoint 객체를 인자로 전달
-            image_tensor, keypoint_obj_batch, json_str_batch = process_pose(input_json_str, Target_pose_keypoint)
+            image_tensor, keypoint_obj_batch, json_str_batch = process_pose(pose_frames, Target_pose_keypoint)
             if image_tensor is not None:
-                return { "ui": {"POSE_JSON": [json_str_batch]}, "result": (image_tensor, keypoint_obj_batch, json_str_batch) }
+                with profile_stage(profiler, "json_output"):
+                    ui = pose_json_ui(keypoint_obj_batch, json_str_batch, ui_preview_frames, compact_json)
+                return { "ui": ui, "result": (image_tensor, keypoint_obj_batch, json_str_batch) }
 
         W, H = 512, 768
         blank_person = dict(pose_keypoints_2d=[], face_keypoints_2d=[], hand_left_keypoints_2d=[], hand_right_keypoints_2d=[])
         blank_output_keypoints = [{"people": [blank_person], "canvas_width": W, "canvas_height": H}]
-        W_scaled = resolution_x if resolution_x >= 64 else W
-        H_scaled = int(H*(W_scaled*1.0/W))
+        H_scaled, W_scaled = get_render_size((W, H, W, H), resolution_x, draft_width if draft_preview else 0)
         blank_pose_for_draw = {"people": [blank_person]}
         pose_img = [draw_pose(blank_pose_for_draw, H_scaled, W_scaled, pose_marker_size, face_marker_size, hand_marker_size)]
         pose_img_np = np.array(pose_img).astype(np.float32) / 255
         return { "ui": {"POSE_JSON": [json.dumps(blank_output_keypoints)]}, "result": (torch.from_numpy(pose_img_np), blank_output_keypoints, json.dumps(blank_output_keypoints)) }
 
 
+class PoseKeypointTransformNode:
+    # OpenposeEditorNode 입력 중 렌더링에만 쓰이는 항목
+    RENDER_ONLY_INPUTS = ("show_body", "show_face", "show_hands", "pose_marker_size", "face_marker_size", "hand_marker_size", "render_workers", "use_stamp_cache",
+                          "draft_preview", "draft_width")
+    # 에디터 노드의 결과 캐시/프로파일링 설정
+    EDITOR_ONLY_INPUTS = ("result_cache_mb", "profile_stages", "ui_preview_frames")
+
+    @classmethod
+    def INPUT_TYPES(s):
+        editor_inputs = OpenposeEditorNode.INPUT_TYPES()["optional"]
+        return {
+            "optional": {name: spec for name, spec in editor_inputs.items() if name not in s.RENDER_ONLY_INPUTS + s.EDITOR_ONLY_INPUTS},
+        }
+
+    RETURN_NAMES = ("POSE_KEYPOINT", "POSE_JSON")
+    RETURN_TYPES = ("POSE_KEYPOINT", "STRING")
+    FUNCTION = "transform_pose"
+    CATEGORY = "ultimate-openpose"
+
+    def transform_pose(self, resolution_x, use_ground_plane,
+                       pelvis_scale, torso_scale, neck_scale, head_scale, eye_distance_scale, eye_height, eyebrow_height,
+                       left_eye_scale, right_eye_scale, left_eyebrow_scale, right_eyebrow_scale,
+                       mouth_scale, nose_scale_face, face_shape_scale,
+                       shoulder_scale, arm_scale, leg_scale, hands_scale, overall_scale,
+                       POSE_JSON: str, POSE_KEYPOINT=None, Target_pose_keypoint=None, batch_mode=False, retarget_mode="first_person",
+                       compact_json=False):
+        """
+        Apply the same scaling and retargeting as OpenposeEditorNode without allocating or drawing any canvases.
+        """
+        from .util import draw_pose_json
+        pose_frames = prepare_pose_input(POSE_JSON, POSE_KEYPOINT)
+        if not pose_frames:
+            return (None, "[]")
+
+        _, final_keypoints_batch = draw_pose_json(
+            pose_frames, resolution_x, use_ground_plane, True, True, True,
+            0, 0, 0,
+            pelvis_scale, torso_scale, neck_scale, head_scale, eye_distance_scale, eye_height, eyebrow_height,
+            left_eye_scale, right_eye_scale, left_eyebrow_scale, right_eyebrow_scale,
+            mouth_scale, nose_scale_face, face_shape_scale,
+            shoulder_scale, arm_scale, leg_scale, hands_scale, overall_scale,
+            target_pose_keypoint_obj=Target_pose_keypoint, batch_mode=batch_mode, render_images=False, retarget_mode=retarget_mode
+        )
+        final_json_str = format_pose_json(final_keypoints_batch, compact_json)
+        register_pose_output(final_keypoints_batch, final_json_str)
+        return (final_keypoints_batch, final_json_str)
+
+
 class PoseBatchLoaderNode:
     @classmethod
     def INPUT_TYPES(s):
@@ -140,11 +325,16 @@ class PoseBatchLoaderNode:
             "required": {
                 "folder_path": ("STRING", {"default": "", "multiline": False}),
                 "file_pattern": ("STRING", {"default": "*.json", "multiline": False}),
-                "current_index": ("INT", {"default": 0, "min": 0, "max": 10000}),
+                "current_index": ("INT", {"default": 0, "min": 0, "max": 1000000}),
             },
             "optional": {
                 "sort_files": ("BOOLEAN", {"default": True}),
                 "loop_batch": ("BOOLEAN", {"default": False}),
+                "natural_sort": ("BOOLEAN", {"default": False}),
+                "load_mode": (["single", "window"], {"default": "single"}),
+                "window_count": ("INT", {"default": 16, "min": 0, "max": 1000000}),
+                "window_stride": ("INT", {"default": 1, "min": 1, "max": 10000}),
+                "prefetch_count": ("INT", {"default": 4, "min": 0, "max": 64}),
             }
         }
     
@@ -153,9 +343,93 @@ class PoseBatchLoaderNode:
     FUNCTION = "load_batch_pose"
     CATEGORY = "ultimate-openpose"
 
-    def load_batch_pose(self, folder_path, file_pattern, current_index, sort_files=True, loop_batch=False):
+    @staticmethod
+    def select_file(folder_path, file_pattern, current_index, sort_files=True, loop_batch=False, natural_sort=False):
+        """Return (json_files, clamped or wrapped current_index); json_files is empty when nothing matches."""
+        json_files = list_pose_files(folder_path, file_pattern, sort_files, natural_sort)
+        total_files = len(json_files)
+        
+        # Handle looping
+        if loop_batch and total_files > 0:
+            current_index = current_index % total_files
+        elif current_index >= total_files:
+            current_index = max(0, total_files - 1)
+        return json_files, current_index
+
+    @staticmethod
+    def window_indices(total_files, start, window_count, window_stride=1, loop_batch=False):
+        """
+        File indices start, start+stride, ... of a window of window_count files (0 = up to the last file).
+        With loop_batch the window wraps around to the first file, otherwise it stops at the last one.
+        """
+        if total_files <= 0:
+            return []
+        window_stride = max(1, window_stride)
+        if loop_batch:
+            count = window_count if window_count > 0 else -(-total_files // window_stride)
+            return [(start + i * window_stride) % total_files for i in range(count)]
+        stop = total_files if window_count <= 0 else min(total_files, start + window_count * window_stride)
+        return list(range(start, stop, window_stride))
+
+    @classmethod
+    def select_files(s, folder_path, file_pattern, current_index, sort_files=True, loop_batch=False, natural_sort=False,
+                     load_mode="single", window_count=16, window_stride=1):
+        """Return (json_files, start index, indices of the files to load) for either load mode."""
+        json_files, current_index = s.select_file(folder_path, file_pattern, current_index, sort_files, loop_batch, natural_sort)
+        if not json_files:
+            return json_files, current_index, []
+        if load_mode == "window":
+            return json_files, current_index, s.window_indices(len(json_files), current_index, window_count, window_stride, loop_batch)
+        return json_files, current_index, [current_index]
+
+    @classmethod
+    def IS_CHANGED(s, folder_path, file_pattern, current_index, sort_files=True, loop_batch=False, natural_sort=False,
+                   load_mode="single", window_count=16, window_stride=1, prefetch_count=4):
+        # 선택된 파일들의 경로와 수정 시각이 같으면 ComfyUI가 이전 결과를 재사용한다
+        try:
+            json_files, current_index, indices = s.select_files(folder_path, file_pattern, current_index, sort_files, loop_batch,
+                                                                natural_sort, load_mode, window_count, window_stride)
+            if not indices:
+                return ""
+            stamps = []
+            for index in indices:
+                stat = os.stat(json_files[index])
+                stamps.append(f"{json_files[index]}:{stat.st_mtime_ns}:{stat.st_size}")
+            return stamps[0] if len(stamps) == 1 else content_hash(stamps)
+        except OSError:
+            return float("nan")
+
+    def __init__(self):
+        self.last_index = None
+
+    def prefetch_next(self, json_files, start, last, step, prefetch_count, loop_batch):
+        """
+        Start reading the prefetch_count files the next steps would load: every step-th file after last, or before
+        start when the index went down since the previous execution.
+        """
+        # 이전 실행보다 index가 줄었으면 거꾸로 넘기는 중으로 보고 그 방향으로 미리 읽는다
+        if self.last_index is not None and start < self.last_index:
+            last, step = start, -step
+        self.last_index = start
+        total_files = len(json_files)
+        upcoming = []
+        for i in range(1, prefetch_count + 1):
+            index = last + i * step
+            if loop_batch:
+                index %= total_files
+            elif not 0 <= index < total_files:
+                break
+            upcoming.append(json_files[index])
+        pose_prefetcher.prefetch(upcoming)
+
+    def load_batch_pose(self, folder_path, file_pattern, current_index, sort_files=True, loop_batch=False, natural_sort=False,
+                        load_mode="single", window_count=16, window_stride=1, prefetch_count=4):
         """
         Load pose JSON files from a folder and return them one by one based on current_index.
+        The folder listing is cached until the folder changes, so stepping through large folders stays cheap.
+        In "window" mode window_count files starting at current_index (every window_stride-th file) are
+        returned as one POSE_KEYPOINT frame list, with FILENAME listing the file of each frame, one per line.
+        With prefetch_count the files of the next steps are read in the background while this step is used.
         """
         try:
             # Validate folder path
@@ -163,38 +437,38 @@ class PoseBatchLoaderNode:
                 print(f"Error: Folder path '{folder_path}' does not exist")
                 return (None, "{}", "No files found", 0, 0)
             
-            # Get all JSON files matching the pattern
-            search_pattern = os.path.join(folder_path, file_pattern)
-            json_files = glob.glob(search_pattern)
+            # Get all JSON files matching the pattern (cached per folder/pattern/sort order)
+            json_files, current_index = self.select_file(folder_path, file_pattern, current_index, sort_files, loop_batch, natural_sort)
             
             if not json_files:
-                print(f"No files found matching pattern: {search_pattern}")
+                print(f"No files found matching pattern: {os.path.join(folder_path, file_pattern)}")
                 return (None, "{}", "No files found", 0, 0)
             
-            # Sort files if requested
-            if sort_files:
-                json_files.sort()
-            
             total_files = len(json_files)
-            
-            # Handle looping
-            if loop_batch and total_files > 0:
-                current_index = current_index % total_files
-            elif current_index >= total_files:
-                current_index = max(0, total_files - 1)
+
+            if load_mode == "window":
+                indices = self.window_indices(total_files, current_index, window_count, window_stride, loop_batch)
+                # 창 안의 파일들은 병렬로 읽고, 다 읽은 뒤 다음 창의 파일들을 미리 읽기 시작한다
+                pose_prefetcher.prefetch([json_files[index] for index in indices])
+                result = self.load_window(json_files, indices, current_index)
+                if prefetch_count > 0 and indices:
+                    self.prefetch_next(json_files, current_index, indices[-1], window_stride, prefetch_count, loop_batch)
+                return result
             
             # Load the current file
             current_file = json_files[current_index]
             filename = os.path.basename(current_file)
+            if prefetch_count > 0:
+                self.prefetch_next(json_files, current_index, current_index, 1, prefetch_count, loop_batch)
             
             try:
-                with open(current_file, 'r', encoding='utf-8') as f:
-                    pose_data = json.load(f)
+                pose_data = pose_prefetcher.get(current_file)
                 
                 # Convert to string for POSE_JSON output
                 pose_json_str = json.dumps(pose_data, indent=2)
                 
                 print(f"Loaded pose file: {filename} ({current_index + 1}/{total_files})")
+                register_pose_output(pose_data, pose_json_str)
                 
                 return (pose_data, pose_json_str, filename, total_files, current_index)
                 
@@ -209,6 +483,99 @@ class PoseBatchLoaderNode:
             print(f"Error in load_batch_pose: {e}")
             return (None, "{}", "Error", 0, 0)
 
+    def load_window(self, json_files, indices, current_index):
+        """Load the files at indices into one frame list; files holding a frame list contribute every frame."""
+        frames = []
+        frame_filenames = []
+        for index in indices:
+            filename = os.path.basename(json_files[index])
+            try:
+                pose_data = pose_prefetcher.get(json_files[index])
+            except json.JSONDecodeError as e:
+                print(f"Error parsing JSON file {filename}: {e}")
+                continue
+            except Exception as e:
+                print(f"Error reading file {filename}: {e}")
+                continue
+            # 파일 하나에 여러 프레임이 들어 있으면 프레임마다 파일 이름을 기록한다
+            file_frames = pose_data if isinstance(pose_data, list) else [pose_data]
+            frames.extend(file_frames)
+            frame_filenames.extend([filename] * len(file_frames))
+
+        total_files = len(json_files)
+        if not frames:
+            return (None, "{}", "No files loaded", total_files, current_index)
+        print(f"Loaded {len(frames)} pose frames from {len(indices)} files starting at {current_index + 1}/{total_files}")
+        pose_json_str = json.dumps(frames, indent=2)
+        register_pose_output(frames, pose_json_str)
+        return (frames, pose_json_str, "\n".join(frame_filenames), total_files, current_index)
+
+
+class PoseSequenceLoaderNode:
+    @classmethod
+    def INPUT_TYPES(s):
+        return {
+            "required": {
+                "sequence_path": ("STRING", {"default": "", "multiline": False}),
+                "start_index": ("INT", {"default": 0, "min": 0, "max": 10000000}),
+            },
+            "optional": {
+                "frame_count": ("INT", {"default": 0, "min": 0, "max": 10000000}),
+                "frame_stride": ("INT", {"default": 1, "min": 1, "max": 10000}),
+                "loop_batch": ("BOOLEAN", {"default": False}),
+            }
+        }
+
+    RETURN_NAMES = ("POSE_KEYPOINT", "POSE_JSON", "FILENAME", "TOTAL_COUNT", "CURRENT_INDEX")
+    RETURN_TYPES = ("POSE_KEYPOINT", "STRING", "STRING", "INT", "INT")
+    FUNCTION = "load_sequence"
+    CATEGORY = "ultimate-openpose"
+
+    @classmethod
+    def IS_CHANGED(s, sequence_path, start_index, frame_count=0, frame_stride=1, loop_batch=False):
+        try:
+            stat = os.stat(sequence_path)
+            return f"{os.path.abspath(sequence_path)}:{stat.st_mtime_ns}:{stat.st_size}"
+        except OSError:
+            return float("nan")
+
+    def load_sequence(self, sequence_path, start_index, frame_count=0, frame_stride=1, loop_batch=False):
+        """
+        Load frame_count frames (0 = up to the last frame) from a .poseseq file written by convert_pose_folder.py
+        or a JSON Lines file (.jsonl, one frame per line), starting at start_index and taking every
+        frame_stride-th frame, as one POSE_KEYPOINT frame list.
+        .poseseq files are memory-mapped and JSON Lines files indexed by line offset, so only the selected
+        frames are read and decoded.
+        """
+        from .pose_sequence import open_pose_sequence
+        try:
+            if not sequence_path or not os.path.exists(sequence_path):
+                print(f"Error: Sequence file '{sequence_path}' does not exist")
+                return (None, "{}", "No frames found", 0, 0)
+
+            sequence = open_pose_sequence(sequence_path)
+            total_frames = len(sequence)
+            if total_frames == 0:
+                print(f"No frames in sequence file: {sequence_path}")
+                return (None, "{}", "No frames found", 0, 0)
+
+            if loop_batch:
+                start_index = start_index % total_frames
+            elif start_index >= total_frames:
+                start_index = total_frames - 1
+            indices = PoseBatchLoaderNode.window_indices(total_frames, start_index, frame_count, frame_stride, loop_batch)
+
+            frames = sequence.frames(indices)
+            frame_filenames = [sequence.filename(index) for index in indices]
+            print(f"Loaded {len(frames)} pose frames from {os.path.basename(sequence_path)} starting at {start_index + 1}/{total_frames}")
+            pose_json_str = json.dumps(frames, indent=2)
+            register_pose_output(frames, pose_json_str)
+            return (frames, pose_json_str, "\n".join(frame_filenames), total_frames, start_index)
+
+        except Exception as e:
+            print(f"Error in load_sequence: {e}")
+            return (None, "{}", "Error", 0, 0)
+
 
 class PoseBatchIteratorNode:
     @classmethod
@@ -280,6 +647,7 @@ class PoseReferenceLoaderNode:
                     pose_data = json.load(f)
                 
                 print(f"Loaded reference pose: {filename}")
+                register_pose_output(pose_data, None)
                 return (pose_data,)
                 
             except json.JSONDecodeError as e:
@@ -305,6 +673,9 @@ class PoseSaverNode:
             },
             "optional": {
                 "filename_prefix": ("STRING", {"default": "", "multiline": False}),
+                "save_mode": (["single_file", "per_frame", "jsonl_append"], {"default": "single_file"}),
+                "compact_json": ("BOOLEAN", {"default": False}),
+                "background_write": ("BOOLEAN", {"default": False}),
             }
         }
 
@@ -314,7 +685,15 @@ class PoseSaverNode:
     CATEGORY = "ultimate-openpose"
     OUTPUT_NODE = True
 
-    def save_pose_keypoint(self, pose_keypoint, target_folder, filename, filename_prefix=""):
+    def save_pose_keypoint(self, pose_keypoint, target_folder, filename, filename_prefix="",
+                           save_mode="single_file", compact_json=False, background_write=False):
+        """
+        Save the pose data as one JSON file, or in "per_frame" mode as one numbered file per frame
+        (<prefix><name>_00000.json, ...), or in "jsonl_append" mode append every frame as one line to
+        <prefix><name>.jsonl. JSON files are written to a temporary name and renamed into place.
+        compact_json drops the indentation; background_write queues the files to a writer thread and
+        returns right away. SAVED_FILE_PATH lists every file, one per line.
+        """
         if pose_keypoint is None:
             print("PoseSaverNode: No pose_keypoint data to save.")
             return ("",) 
@@ -336,18 +715,39 @@ class PoseSaverNode:
             
             prefix = filename_prefix if filename_prefix is not None else ""
 
-            final_filename = f"{prefix}{base_name_from_input}.json"
-            
-            file_path = os.path.join(target_folder, final_filename)
-
             # Ensure canvas dimensions are present before saving
             processed_pose_keypoint = self._ensure_canvas_dimensions(pose_keypoint)
 
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(processed_pose_keypoint, f, indent=4) 
+            frames = processed_pose_keypoint if isinstance(processed_pose_keypoint, list) else [processed_pose_keypoint]
+            if save_mode == "jsonl_append":
+                file_path = os.path.join(target_folder, f"{prefix}{base_name_from_input}.jsonl")
+                if background_write:
+                    pose_file_writer.submit([(file_path, frames)], append_lines=True)
+                else:
+                    append_json_lines(file_path, frames)
+                print(f"PoseSaverNode: {'Queued' if background_write else 'Appended'} {len(frames)} frames to {file_path}")
+                return (file_path,)
+
+            if save_mode == "per_frame":
+                files = [(os.path.join(target_folder, f"{prefix}{base_name_from_input}_{i:05d}.json"), frame) for i, frame in enumerate(frames)]
+            else:
+                files = [(os.path.join(target_folder, f"{prefix}{base_name_from_input}.json"), processed_pose_keypoint)]
+
+            if not files:
+                print("PoseSaverNode: No frames to save.")
+                return ("",)
 
-            print(f"PoseSaverNode: Saved pose to {file_path}")
-            return (file_path,)
+            indent = None if compact_json else 4
+            if background_write:
+                pose_file_writer.submit(files, indent)
+            else:
+                for file_path, data in files:
+                    write_json_atomic(file_path, data, indent)
+
+            saved_paths = "\n".join(file_path for file_path, _ in files)
+            action = "Queued" if background_write else "Saved"
+            print(f"PoseSaverNode: {action} pose to {files[0][0]}" + (f" and {len(files) - 1} more files" if len(files) > 1 else ""))
+            return (saved_paths,)
 
         except Exception as e:
             print(f"PoseSaverNode: Error saving pose - {e}")
@@ -358,33 +758,20 @@ class PoseSaverNode:
         if pose_keypoint is None:
             return None
         
-        # Make a deep copy to avoid modifying the original
-        import copy
-        processed_data = copy.deepcopy(pose_keypoint)
-        
-        # Handle different data structures
-        if isinstance(processed_data, list):
+        # Only frames missing a dimension are copied (shallowly); the original data is never modified
+        if isinstance(pose_keypoint, list):
             # List of pose objects
-            for item in processed_data:
-                if isinstance(item, dict):
-                    if 'canvas_width' not in item:
-                        item['canvas_width'] = 512
-                    if 'canvas_height' not in item:
-                        item['canvas_height'] = 768
-        elif isinstance(processed_data, dict):
-            # Single pose object
-            if 'canvas_width' not in processed_data:
-                processed_data['canvas_width'] = 512
-            if 'canvas_height' not in processed_data:
-                processed_data['canvas_height'] = 768
-        
-        return processed_data
+            return [apply_canvas_defaults(item) for item in pose_keypoint]
+        # Single pose object
+        return apply_canvas_defaults(pose_keypoint)
 
 
 # Add the new nodes to the node class mappings
 NODE_CLASS_MAPPINGS = {
     "OpenposeEditorNode": OpenposeEditorNode,
+    "PoseKeypointTransformNode": PoseKeypointTransformNode,
     "PoseBatchLoaderNode": PoseBatchLoaderNode,
+    "PoseSequenceLoaderNode": PoseSequenceLoaderNode,
     "PoseBatchIteratorNode": PoseBatchIteratorNode,
     "PoseReferenceLoaderNode": PoseReferenceLoaderNode,
     "PoseSaverNode": PoseSaverNode, # Added new node
@@ -392,7 +779,9 @@ NODE_CLASS_MAPPINGS = {
 
 NODE_DISPLAY_NAME_MAPPINGS = {
     "OpenposeEditorNode": "OpenPose Editor",
+    "PoseKeypointTransformNode": "Pose Keypoint Transform",
     "PoseBatchLoaderNode": "Pose Batch Loader",
+    "PoseSequenceLoaderNode": "Pose Sequence Loader",
     "PoseBatchIteratorNode": "Pose Batch Iterator",
     "PoseReferenceLoaderNode": "Pose Reference Loader",
     "PoseSaverNode": "Pose Saver", # Added new node display name
@@ -0,0 +1,239 @@
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+def content_hash(*parts):
+    """Stable hex digest of JSON-serializable parts such as pose objects, strings and node parameters."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(json.dumps(part, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8'))
+        digest.update(b'\x1e')
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache bounded by an approximate byte budget.
+    Entries larger than the whole budget are not stored.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes):
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)[1]
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (value, nbytes)
+            self.total_bytes += nbytes
+            self._evict()
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            self.total_bytes -= entry[1]
+            return entry[0]
+
+    def resize(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self._entries:
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self.total_bytes -= nbytes
+
+
+# OpenposeEditorNode 결과 캐시 (모든 노드 인스턴스가 공유)
+editor_result_cache = LRUCache(512 * 1024 * 1024)
+
+# 노드 id별 마지막 POSE_KEYPOINT 출력 (UI에는 일부 프레임만 보내고, 에디터가 열릴 때 서버에서 전체를 가져간다)
+pose_json_sources = LRUCache(256 * 1024 * 1024)
+
+
+_MISSING = object()
+
+class StageCache:
+    """
+    Per-stage LRU caches for draw_pose_json. Each stage is keyed by a hash of its own inputs, including the keys
+    of the stages it builds on, so changing a parameter only reruns the stages downstream of it.
+    Cached values are shared between calls and must not be modified.
+    """
+
+    def __init__(self, entries_per_stage=4):
+        self.entries_per_stage = entries_per_stage
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def key(self, *parts):
+        # 로더가 등록한 JSON 문자열은 전체를 다시 직렬화하지 않고 등록된 해시로 대신한다
+        return content_hash(*(parsed_pose_store.token(part) for part in parts))
+
+    def run(self, stage, key, compute):
+        """Return the cached value of stage for key, calling compute() and storing its result on a miss."""
+        with self._lock:
+            cache = self._stages.get(stage)
+            if cache is None:
+                cache = self._stages[stage] = LRUCache(self.entries_per_stage) # 항목 하나를 1로 센다
+        value = cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            cache.put(key, value, 1)
+        return value
+
+    def stats(self):
+        """(hits, misses) per stage."""
+        with self._lock:
+            return {stage: (cache.hits, cache.misses) for stage, cache in self._stages.items()}
+
+    def clear(self):
+        with self._lock:
+            for cache in self._stages.values(): cache.clear()
+
+
+class _NoStageCache:
+    """StageCache stand-in that always computes, without hashing any inputs."""
+
+    def key(self, *parts):
+        return None
+
+    def run(self, stage, key, compute):
+        return compute()
+
+NO_STAGE_CACHE = _NoStageCache()
+
+# OpenposeEditorNode 단계별 캐시 (마커 크기/표시 옵션만 바뀌면 키포인트 변환을 다시 하지 않는다)
+pose_stage_cache = StageCache()
+
+
+class ParsedPoseStore:
+    """
+    Process-wide store of parsed, canvas-normalized pose frame lists, keyed by content hash.
+
+    Loaders register the POSE_KEYPOINT object and POSE_JSON string they output. Nodes downstream then find the
+    frames by identity (or by the string) instead of parsing the string again. Only strings, which cannot change,
+    are replaced by the registered hash in cache keys; objects are hashed by content, since another node may
+    have modified them in place. Bounded by an approximate byte budget like LRUCache.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict() # key -> (frames, objects, text, nbytes)
+        self._by_id = {}
+        self._by_text = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def register(self, frames, source=None, text=None):
+        """
+        Store frames (the normalized frame list) as the parsed form of source (the object a node outputs) and
+        text (its JSON string). Returns the content key.
+        """
+        if text is not None:
+            encoded = text
+        else:
+            encoded = json.dumps(frames, sort_keys=True, separators=(',', ':'), default=str)
+        key = hashlib.blake2b(encoded.encode('utf-8'), digest_size=16).hexdigest()
+        # 파싱된 객체는 대략 JSON 문자열만큼 메모리를 차지한다고 본다
+        nbytes = 2 * len(encoded)
+        objects = tuple(obj for obj in (frames, source) if obj is not None)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if nbytes > self.max_bytes:
+                return key
+            self._entries[key] = (frames, objects, text, nbytes)
+            for obj in objects:
+                self._by_id[id(obj)] = key
+            if text is not None:
+                self._by_text[text] = key
+            self.total_bytes += nbytes
+            while self.total_bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+        return key
+
+    def lookup(self, pose):
+        """(key, frames) for a registered object or JSON string, else None."""
+        with self._lock:
+            key = self._find(pose)
+            if key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return key, self._entries[key][0]
+
+    def token(self, value):
+        """Stand-in for value in content hashes: the registered key for registered JSON strings, else value itself."""
+        # 객체는 다른 노드가 제자리에서 바꿀 수 있으므로 id로 찾지 않고 내용으로 해시되게 둔다
+        if not isinstance(value, str):
+            return value
+        with self._lock:
+            key = self._by_text.get(value)
+        return value if key is None else ["parsed_pose", key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_id.clear()
+            self._by_text.clear()
+            self.total_bytes = 0
+
+    def _find(self, pose):
+        if isinstance(pose, str):
+            return self._by_text.get(pose)
+        key = self._by_id.get(id(pose))
+        # id는 객체가 사라지면 재사용되므로 항목이 실제로 그 객체를 잡고 있는지 확인한다
+        if key is not None and any(obj is pose for obj in self._entries[key][1]):
+            return key
+        return None
+
+    def _remove(self, key):
+        _, objects, text, nbytes = self._entries.pop(key)
+        for obj in objects:
+            if self._by_id.get(id(obj)) == key:
+                del self._by_id[id(obj)]
+        if text is not None and self._by_text.get(text) == key:
+            del self._by_text[text]
+        self.total_bytes -= nbytes
+
+
+# 로더가 출력한 포즈를 여러 노드가 다시 파싱/해시하지 않도록 공유하는 저장소
+parsed_pose_store = ParsedPoseStore(256 * 1024 * 1024)
@@ -0,0 +1,4 @@
+# 노드 정의(INPUT_TYPES)와 util이 함께 쓰는 값. 노드 등록 시 util(numpy, cv2)을 불러오지 않도록 따로 둔다
+
+# 배치 단위 리타게팅 방식 (util.draw_pose_json의 retarget_mode)
+RETARGET_MODES = ("first_person", "per_person", "sequence_median")
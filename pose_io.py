@@ -0,0 +1,210 @@
+import os
+import re
+import json
+import glob
+import time
+import queue
+import atexit
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# 디렉터리 mtime 해상도가 거친 파일시스템(FAT 2초 등)을 고려해, 스캔 직전에 바뀐 디렉터리 목록은 믿지 않는다
+MTIME_GRANULARITY_NS = 2_000_000_000
+
+_directory_indexes = {}
+_directory_indexes_lock = threading.Lock()
+
+def natural_sort_key(path):
+    """Sort key that orders embedded numbers by value, so frame_2 comes before frame_10."""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', path)]
+
+def list_pose_files(folder_path, file_pattern, sort_files=True, natural_sort=False):
+    """
+    Files in folder_path matching file_pattern, sorted by name (or naturally). The listing is kept per
+    (folder, pattern, sort order) and reused until the folder's mtime changes, so stepping through a large folder
+    does not glob and sort it again for every file. Patterns reaching into subfolders are always rescanned,
+    because adding files there does not touch the folder's own mtime.
+    """
+    search_pattern = os.path.join(folder_path, file_pattern)
+    cacheable = os.sep not in file_pattern and '/' not in file_pattern
+    key = (os.path.abspath(folder_path), file_pattern, sort_files, natural_sort)
+    folder_mtime = os.stat(folder_path).st_mtime_ns
+
+    if cacheable:
+        with _directory_indexes_lock:
+            entry = _directory_indexes.get(key)
+        if entry is not None and entry[0] == folder_mtime and entry[1] - folder_mtime > MTIME_GRANULARITY_NS:
+            return entry[2]
+
+    scan_time = time.time_ns()
+    files = glob.glob(search_pattern)
+    if sort_files:
+        files.sort(key=natural_sort_key if natural_sort else None)
+    files = tuple(files)
+    if cacheable:
+        with _directory_indexes_lock:
+            _directory_indexes[key] = (folder_mtime, scan_time, files)
+    return files
+
+def clear_directory_indexes():
+    with _directory_indexes_lock:
+        _directory_indexes.clear()
+
+
+def _file_stamp(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def read_pose_file(path):
+    """Parse one pose JSON file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _read_stamped(path):
+    # 읽기 전에 stat을 찍어 두어야 읽는 도중 파일이 바뀌어도 get()에서 낡은 결과로 판단된다
+    stamp = _file_stamp(path)
+    return stamp, read_pose_file(path)
+
+
+class PosePrefetcher:
+    """
+    Reads and parses pose files on background threads ahead of the loader, so the next queued step finds its
+    file already parsed instead of waiting on disk or a network mount.
+
+    At most max_entries files are held (oldest dropped first). get() hands each prefetched object out once and
+    falls back to a synchronous read when the file was not prefetched or changed since it was read; read errors
+    are raised from get() as if the file had been read there.
+    """
+
+    def __init__(self, max_workers=4, max_entries=64):
+        self.max_workers = max_workers
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._executor = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def prefetch(self, paths):
+        """Schedule paths to be read in order; already scheduled paths are kept."""
+        with self._lock:
+            for path in paths[:self.max_entries]:
+                if path in self._entries:
+                    self._entries.move_to_end(path)
+                    continue
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="openpose-prefetch")
+                self._entries[path] = self._executor.submit(_read_stamped, path)
+            while len(self._entries) > self.max_entries:
+                _, future = self._entries.popitem(last=False)
+                future.cancel()
+
+    def get(self, path):
+        """Parsed content of path, from the prefetched read when it is still current."""
+        with self._lock:
+            future = self._entries.pop(path, None)
+        if future is not None and not future.cancelled():
+            try:
+                stamp, data = future.result()
+            except Exception:
+                stamp = None
+            if stamp is not None and stamp == _file_stamp(path):
+                self.hits += 1
+                return data
+        self.misses += 1
+        return read_pose_file(path)
+
+    def clear(self):
+        with self._lock:
+            for future in self._entries.values():
+                future.cancel()
+            self._entries.clear()
+
+
+# PoseBatchLoaderNode가 공유하는 선읽기 캐시
+pose_prefetcher = PosePrefetcher()
+
+
+def write_json_atomic(path, data, indent=None):
+    """
+    Write data as JSON to a temporary file next to path and rename it over path, so readers never see a
+    partially written file. indent=None writes compact JSON without whitespace.
+    """
+    tmp_path = f"{path}.tmp{os.getpid()}_{threading.get_ident()}"
+    separators = (',', ':') if indent is None else None
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=indent, separators=separators)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def append_json_lines(path, frames):
+    """Append frames to a JSON Lines file, one compact frame per line, in a single write."""
+    lines = "".join(json.dumps(frame, separators=(',', ':')) + "\n" for frame in frames)
+    # 이전 쓰기가 줄 끝 없이 끝났으면 새 프레임이 그 줄에 붙지 않도록 줄을 바꾼다
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        with open(path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                lines = "\n" + lines
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(lines)
+
+
+class PoseFileWriter:
+    """
+    Writes JSON files on one background thread so saving long batches does not block the node executing.
+
+    Each submit() queues one batch of files; at most max_pending batches wait, and submit() blocks while the queue
+    is full, which keeps memory bounded when the graph produces poses faster than the disk takes them.
+    Write errors are printed and counted. Submitted data is serialized later on the writer thread and must not
+    be modified in the meantime. Files still queued when the interpreter exits are written before it does.
+    """
+
+    def __init__(self, max_pending=8):
+        self.max_pending = max_pending
+        self.written = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+        # 데몬 스레드는 종료 시 그냥 멈추므로, 큐에 남은 파일을 다 쓸 때까지 기다린다
+        atexit.register(self.flush)
+
+    def submit(self, files, indent=None, append_lines=False):
+        """
+        Queue files, a list of (path, data), to be written in order. With append_lines data is a frame list
+        appended to a JSON Lines file instead.
+        """
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="openpose-pose-writer", daemon=True)
+                self._thread.start()
+        self._queue.put((files, indent, append_lines))
+
+    def flush(self):
+        """Block until every submitted file is written."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            files, indent, append_lines = self._queue.get()
+            for path, data in files:
+                try:
+                    if append_lines:
+                        append_json_lines(path, data)
+                    else:
+                        write_json_atomic(path, data, indent)
+                    self.written += 1
+                except Exception as e:
+                    self.failed += 1
+                    print(f"PoseSaverNode: Error writing {path} - {e}")
+            self._queue.task_done()
+
+
+# PoseSaverNode의 백그라운드 저장 스레드 (모든 노드 인스턴스가 공유)
+pose_file_writer = PoseFileWriter()
@@ -0,0 +1,166 @@
+import json
+import asyncio
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from .pose_cache import LRUCache, StageCache, content_hash
+
+PREVIEW_DEFAULT_WIDTH = 512
+PREVIEW_MAX_WIDTH = 2048
+PREVIEW_CACHED_CLIENTS = 32
+
+# 미리보기 전용 단계별 캐시 (에디터 노드의 pose_stage_cache와 따로 둔다)
+preview_stage_cache = StageCache()
+
+def preview_render_kwargs(params):
+    """
+    draw_pose_json keyword arguments from a preview request's params: every OpenposeEditorNode widget that
+    draw_pose_json takes, defaulting like the node and coerced to the widget's type. Unknown names are ignored.
+    render_workers is always 1: the preview renders one frame, and other values would replace util's shared pool.
+    """
+    from .util import draw_pose_json
+    from .openpose_editor_nodes import OpenposeEditorNode
+    accepted = inspect.signature(draw_pose_json).parameters
+    kwargs = {}
+    for name, (kind, *options) in OpenposeEditorNode.INPUT_TYPES()["optional"].items():
+        if name not in accepted or not options or "default" not in options[0]:
+            continue
+        value = params.get(name, options[0]["default"])
+        try:
+            if kind == "BOOLEAN": value = bool(value)
+            elif kind == "INT": value = int(value)
+            elif kind == "FLOAT": value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid value for {name}: {value!r}")
+        if isinstance(kind, list) and value not in kind:
+            raise ValueError(f"invalid value for {name}: {value!r}, expected one of {kind}")
+        kwargs[name] = value
+    kwargs["render_workers"] = 1
+    return kwargs
+
+POSE_PART_KEYS = ("pose_keypoints_2d", "face_keypoints_2d", "hand_left_keypoints_2d", "hand_right_keypoints_2d")
+
+def check_pose_frame(frame, name):
+    """Raise ValueError unless frame has the structure draw_pose_json reads: positive canvas size, people objects, number lists."""
+    if not isinstance(frame, dict):
+        raise ValueError(f"{name} is not a pose object")
+    for key in ("canvas_width", "canvas_height"):
+        value = frame.get(key, 1)
+        if not isinstance(value, (int, float)) or isinstance(value, bool) or not value > 0:
+            raise ValueError(f"{name}: {key} must be a positive number")
+    people = frame.get('people')
+    if people is None:
+        return
+    if not isinstance(people, list) or not all(isinstance(person, dict) for person in people):
+        raise ValueError(f"{name}: people must be a list of objects")
+    for person in people:
+        for key in POSE_PART_KEYS:
+            values = person.get(key)
+            if values is not None and (not isinstance(values, list) or
+                                       not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values)):
+                raise ValueError(f"{name}: {key} must be a list of numbers")
+
+def select_preview_frame(pose, params):
+    """
+    The frame of pose (a POSE_KEYPOINT object or JSON string) that params["frame"] selects, checked with
+    check_pose_frame and with canvas dimensions filled in.
+    """
+    from .openpose_editor_nodes import normalize_pose_frames
+    if isinstance(pose, str):
+        try:
+            pose = json.loads(pose)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"pose is not valid JSON: {e}")
+    # 요청마다 한 번 쓰이는 포즈이므로 parsed_pose_store에 등록하지 않고 바로 정규화한다
+    frames = normalize_pose_frames(pose)
+    if not frames:
+        raise ValueError("no pose frames to render")
+    try:
+        frame_index = min(max(0, int(params.get("frame", 0))), len(frames) - 1)
+    except (TypeError, ValueError):
+        raise ValueError("frame must be an integer")
+    check_pose_frame(frames[frame_index], f"frame {frame_index}")
+    return frames[frame_index]
+
+def render_preview_png(frame, params):
+    """
+    PNG bytes of one pose frame (as returned by select_preview_frame) drawn by draw_pose_json with the editor's
+    parameters. params may also hold "preview_width" and a "Target_pose_keypoint" frame list.
+    """
+    import cv2
+    from .util import draw_pose_json
+    try:
+        preview_width = min(max(64, int(params.get("preview_width", PREVIEW_DEFAULT_WIDTH))), PREVIEW_MAX_WIDTH)
+    except (TypeError, ValueError):
+        raise ValueError("preview_width must be an integer")
+    target = params.get("Target_pose_keypoint")
+    if target is not None:
+        if not isinstance(target, list):
+            raise ValueError("Target_pose_keypoint must be a list of frames")
+        for index, target_frame in enumerate(target):
+            check_pose_frame(target_frame, f"Target_pose_keypoint frame {index}")
+
+    # 에디터 노드의 단계별 캐시 항목을 밀어내지 않도록 미리보기 전용 캐시를 쓴다
+    images, _ = draw_pose_json(
+        [frame], **preview_render_kwargs(params), target_pose_keypoint_obj=target,
+        preview_width=preview_width, stage_cache=preview_stage_cache, show_progress=False)
+    if len(images) == 0:
+        raise ValueError("the selected frame has no drawable pose")
+    ok, encoded = cv2.imencode(".png", cv2.cvtColor(images[0], cv2.COLOR_RGB2BGR))
+    if not ok:
+        raise ValueError("PNG encoding failed")
+    return encoded.tobytes()
+
+
+class PreviewRenderer:
+    """
+    Renders editor previews off the server's event loop, one at a time on a dedicated thread, so util and the
+    preview stage cache stay warm between requests. Parsing the pose, picking the frame and hashing it also
+    happen on that thread.
+
+    Requests are coalesced per client: while a preview is rendering, newer requests from the same client replace
+    the waiting ones, which are answered as superseded (None). A request identical to the client's previous one
+    (same frame content and params) gets the previous PNG again without rendering. A client's coalescing state is dropped once it has nothing
+    pending, and only the last PNGs of the PREVIEW_CACHED_CLIENTS most recent clients are kept.
+    """
+
+    def __init__(self, render=render_preview_png, select=select_preview_frame):
+        self._render = render
+        self._select = select
+        self._executor = None
+        self._sequence = 0
+        self._latest = {}
+        self._locks = {}
+        self._last = LRUCache(PREVIEW_CACHED_CLIENTS) # 클라이언트 하나를 1로 센다
+
+    async def render(self, client, pose, params):
+        """PNG bytes for the request, or None when a newer request from the same client superseded it."""
+        self._sequence += 1
+        sequence = self._latest[client] = self._sequence
+        lock = self._locks.setdefault(client, asyncio.Lock())
+        try:
+            async with lock:
+                if self._latest.get(client) != sequence:
+                    return None
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="openpose-preview")
+                return await asyncio.get_running_loop().run_in_executor(self._executor, self._render_client, client, pose, params)
+        finally:
+            # 이 요청이 클라이언트의 마지막 요청이면 기다리는 요청이 없으므로 상태를 지운다
+            if self._latest.get(client) == sequence:
+                del self._latest[client]
+                self._locks.pop(client, None)
+
+    def _render_client(self, client, pose, params):
+        # 렌더링 스레드에서 실행된다: 그려질 한 프레임만 해시해 직전 요청과 비교한다
+        frame = self._select(pose, params)
+        key = content_hash(frame, params)
+        last = self._last.get(client)
+        if last is not None and last[0] == key:
+            return last[1]
+        png = self._render(frame, params)
+        self._last.put(client, (key, png), 1)
+        return png
+
+
+# 서버 경로가 공유하는 미리보기 렌더러
+preview_renderer = PreviewRenderer()
@@ -0,0 +1,126 @@
+import time
+import tracemalloc
+from collections import OrderedDict
+
+# draw_pose_json / OpenposeEditorNode가 기록하는 단계 (보고서에 이 순서로 표시)
+PIPELINE_STAGES = (
+    "input", "parse", "retarget_metrics", "figure_scaling", "face_scaling",
+    "normalization", "assembly", "raster", "tensor", "json_output",
+)
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+
+def profile_stage(profiler, name):
+    """Context manager timing a stage on profiler, or a no-op when profiler is None."""
+    return _NULL_STAGE if profiler is None else profiler.stage(name)
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "start", "child_seconds", "start_bytes", "peak_bytes")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler._enter(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._exit(self)
+        return False
+
+
+class StageProfiler:
+    """
+    Records wall time, and optionally allocations, of named pipeline stages.
+
+    Stages may nest; a stage's seconds exclude the time spent in its nested stages, so summing the stages
+    never counts the same time twice. With trace_memory, tracemalloc reports the net bytes each
+    stage left allocated and the peak it reached above its starting point (nested stages included).
+    Stages must be entered from a single thread.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stats = OrderedDict()
+        self._stack = []
+        self._started_tracing = False
+
+    def __enter__(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        return self
+
+    def __exit__(self, *exc):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return False
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def _enter(self, stage):
+        stage.child_seconds = 0.0
+        if self.trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                parent = self._stack[-1]
+                parent.peak_bytes = max(parent.peak_bytes, peak)
+            tracemalloc.reset_peak()
+            stage.start_bytes = stage.peak_bytes = current
+        else:
+            stage.start_bytes = None
+        self._stack.append(stage)
+        stage.start = time.perf_counter()
+
+    def _exit(self, stage):
+        elapsed = time.perf_counter() - stage.start
+        self._stack.pop()
+        entry = self.stats.get(stage.name)
+        if entry is None:
+            entry = self.stats[stage.name] = {"calls": 0, "seconds": 0.0}
+        entry["calls"] += 1
+        entry["seconds"] += elapsed - stage.child_seconds
+        if self._stack:
+            self._stack[-1].child_seconds += elapsed
+
+        if stage.start_bytes is not None and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, stage.peak_bytes)
+            entry["allocated_bytes"] = entry.get("allocated_bytes", 0) + current - stage.start_bytes
+            entry["peak_bytes"] = max(entry.get("peak_bytes", 0), peak - stage.start_bytes)
+            if self._stack:
+                parent = self._stack[-1]
+                parent.peak_bytes = max(parent.peak_bytes, peak)
+
+    def report(self):
+        """Structured report: per-stage calls, seconds and (with trace_memory) bytes, in pipeline order, plus the total."""
+        order = {name: i for i, name in enumerate(PIPELINE_STAGES)}
+        names = sorted(self.stats, key=lambda name: order.get(name, len(order)))
+        stages = OrderedDict((name, dict(self.stats[name])) for name in names)
+        return {"stages": stages, "total_seconds": sum(entry["seconds"] for entry in stages.values())}
+
+    def format_report(self):
+        """Human readable table of report()."""
+        report = self.report()
+        total = report["total_seconds"] or 1.0
+        lines = [f"{'stage':<18}{'calls':>8}{'ms':>11}{'share':>8}" + (f"{'alloc MB':>11}{'peak MB':>10}" if self.trace_memory else "")]
+        for name, entry in report["stages"].items():
+            line = f"{name:<18}{entry['calls']:>8}{entry['seconds'] * 1000:>11.2f}{entry['seconds'] / total:>8.1%}"
+            if "peak_bytes" in entry:
+                line += f"{entry['allocated_bytes'] / 2**20:>11.2f}{entry['peak_bytes'] / 2**20:>10.2f}"
+            lines.append(line)
+        lines.append(f"{'total':<18}{'':>8}{report['total_seconds'] * 1000:>11.2f}")
+        return "\n".join(lines)
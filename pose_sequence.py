@@ -0,0 +1,318 @@
+import os
+import json
+import numpy as np
+
+try:
+    from .pose_cache import LRUCache
+except ImportError:
+    from pose_cache import LRUCache
+
+# 포즈 시퀀스 바이너리 형식 (.poseseq)
+#   MAGIC(8) | header 길이(uint32 LE) | JSON header | 64바이트 정렬된 배열들
+# 사람마다 네 부위(body, face, 왼손, 오른손)의 키포인트 행이 keypoints 배열에 이어 붙어 있고,
+# part_offsets / people_offsets가 그 경계를 가리킨다.
+MAGIC = b"OPOSESEQ"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+PART_KEYS = ("pose_keypoints_2d", "face_keypoints_2d", "hand_left_keypoints_2d", "hand_right_keypoints_2d")
+
+# part_flags 비트: 키가 있었는지, x/y가 정수였는지, confidence가 정수였는지 (렌더링이 정수 좌표를 다르게 다루므로 보존),
+# 키포인트가 [x, y, c] 목록으로 중첩되어 있었는지
+PART_PRESENT, PART_INT_COORDS, PART_INT_CONF, PART_NESTED = 1, 2, 4, 8
+FRAME_HAS_PEOPLE = 1
+
+def _is_int_column(values):
+    return all(isinstance(v, int) and not isinstance(v, bool) for v in values)
+
+def _is_triple(value):
+    return isinstance(value, (list, tuple)) and len(value) == 3
+
+def encode_pose_frames(frames, frame_files=None, dtype="float32"):
+    """
+    Pack frame dicts into the columnar arrays of the .poseseq format.
+    frame_files gives, per frame, the index of the file it came from in the sequence's filename list.
+    Keypoint lists may be flat (x, y, confidence) numbers or a list of [x, y, confidence] triples; anything
+    else raises ValueError.
+    """
+    rows, part_offsets, part_flags, people_offsets = [], [0], [], [0]
+    canvas, frame_flags = [], []
+    row_count = 0
+    for frame_idx, frame in enumerate(frames):
+        if not isinstance(frame, dict):
+            raise ValueError(f"frame {frame_idx} is not a pose object")
+        people = frame.get('people')
+        frame_flags.append(FRAME_HAS_PEOPLE if people is not None else 0)
+        canvas.append((frame.get('canvas_width', -1), frame.get('canvas_height', -1)))
+        for person in people or []:
+            for key in PART_KEYS:
+                values = person.get(key) if isinstance(person, dict) else None
+                flags = 0
+                if values is not None:
+                    flags = PART_PRESENT
+                    if values and isinstance(values[0], (list, tuple)):
+                        if not all(_is_triple(v) for v in values):
+                            raise ValueError(f"frame {frame_idx}: {key} mixes [x, y, confidence] triples with other values")
+                        values = [v for triple in values for v in triple]
+                        flags |= PART_NESTED
+                    elif len(values) % 3:
+                        raise ValueError(f"frame {frame_idx}: {key} has {len(values)} values, not a multiple of 3")
+                    if _is_int_column(values[0::3]) and _is_int_column(values[1::3]): flags |= PART_INT_COORDS
+                    if _is_int_column(values[2::3]): flags |= PART_INT_CONF
+                    rows.append(values)
+                    row_count += len(values) // 3
+                part_flags.append(flags)
+                part_offsets.append(row_count)
+        people_offsets.append(len(part_flags) // len(PART_KEYS))
+
+    try:
+        keypoints = np.fromiter((v for values in rows for v in values), dtype=dtype, count=row_count * 3).reshape(-1, 3)
+    except TypeError:
+        raise ValueError("keypoint values must be numbers")
+    return {
+        "keypoints": keypoints,
+        "part_offsets": np.array(part_offsets, dtype=np.int64),
+        "part_flags": np.array(part_flags, dtype=np.uint8).reshape(-1, len(PART_KEYS)),
+        "people_offsets": np.array(people_offsets, dtype=np.int64),
+        "canvas": np.array(canvas, dtype=np.int32).reshape(-1, 2),
+        "frame_flags": np.array(frame_flags, dtype=np.uint8),
+        "frame_file": np.array(frame_files if frame_files is not None else [-1] * len(frame_flags), dtype=np.int32),
+    }
+
+def write_pose_sequence(path, frames, frame_files=None, filenames=(), dtype="float32"):
+    """Write frames to a .poseseq file, replacing it atomically. Returns the number of frames written."""
+    return _write_arrays(path, encode_pose_frames(frames, frame_files, dtype), filenames)
+
+def concat_pose_arrays(parts):
+    """Join encode_pose_frames results into the arrays of one sequence, in order."""
+    if not parts:
+        return encode_pose_frames([])
+    arrays = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]
+              if name not in ("part_offsets", "people_offsets")}
+    # 오프셋 배열은 앞 조각들의 행/사람 수만큼 밀어서 잇는다
+    for name, counted in (("part_offsets", "keypoints"), ("people_offsets", "part_flags")):
+        shifted, total = [np.zeros(1, dtype=np.int64)], 0
+        for part in parts:
+            shifted.append(part[name][1:] + total)
+            total += len(part[counted])
+        arrays[name] = np.concatenate(shifted)
+    return {name: arrays[name] for name in parts[0]}
+
+def _write_arrays(path, arrays, filenames):
+    header = {"version": FORMAT_VERSION, "frames": len(arrays["frame_flags"]), "filenames": list(filenames), "arrays": {}}
+
+    # 헤더 길이가 배열 위치에 영향을 주므로, 위치가 더 이상 바뀌지 않을 때까지 다시 계산한다
+    header_bytes = b""
+    while True:
+        offset = _align(len(MAGIC) + 4 + len(header_bytes))
+        for name, array in arrays.items():
+            header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset = _align(offset + array.nbytes)
+        encoded = json.dumps(header, separators=(',', ':')).encode('utf-8')
+        if len(encoded) == len(header_bytes):
+            break
+        header_bytes = encoded
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC + len(header_bytes).to_bytes(4, 'little') + header_bytes)
+            for name, array in arrays.items():
+                f.write(b"\0" * (header["arrays"][name]["offset"] - f.tell()))
+                f.write(np.ascontiguousarray(array).tobytes())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return header["frames"]
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def _to_list(rows, as_int):
+    if rows.dtype == np.float32:
+        # float32 값을 유효숫자 7자리 float64로 되돌려 JSON에 396.7393처럼 짧게 나오게 한다
+        rows = rows.astype(np.float64)
+        magnitude = np.abs(rows, where=rows != 0, out=np.ones_like(rows))
+        scale = 10.0 ** (6 - np.floor(np.log10(magnitude)))
+        rows = np.round(rows * scale) / scale
+    return rows.astype(np.int64).tolist() if as_int else rows.tolist()
+
+
+class PoseSequence:
+    """
+    Read-only, memory-mapped view of a .poseseq file.
+
+    Opening only reads the header; frames are decoded on access, so frame(i) is O(1) in the sequence length
+    and keypoint_rows() slices the mapped keypoint array without copying.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a pose sequence file")
+            header_len = int.from_bytes(f.read(4), 'little')
+            header = json.loads(f.read(header_len).decode('utf-8'))
+        if header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported pose sequence version {header.get('version')}")
+        self.filenames = header["filenames"]
+        self._map = np.memmap(path, dtype=np.uint8, mode='r')
+        for name, spec in header["arrays"].items():
+            shape = tuple(spec["shape"])
+            array = np.ndarray(shape, dtype=np.dtype(spec["dtype"]), buffer=self._map, offset=spec["offset"]) if 0 not in shape \
+                else np.zeros(shape, dtype=np.dtype(spec["dtype"]))
+            setattr(self, name, array)
+
+    def __len__(self):
+        return len(self.frame_flags)
+
+    def filename(self, index):
+        file_index = int(self.frame_file[index])
+        return self.filenames[file_index] if 0 <= file_index < len(self.filenames) else ""
+
+    def keypoint_rows(self, start, stop):
+        """Zero-copy (rows, 3) view of every keypoint of frames [start, stop)."""
+        first_part = self.people_offsets[start] * len(PART_KEYS)
+        last_part = self.people_offsets[stop] * len(PART_KEYS)
+        return self.keypoints[self.part_offsets[first_part]:self.part_offsets[last_part]]
+
+    def frame(self, index):
+        """Decode frame index into an OpenPose frame dict."""
+        frame = {}
+        width, height = (int(v) for v in self.canvas[index])
+        if width >= 0: frame['canvas_width'] = width
+        if height >= 0: frame['canvas_height'] = height
+        if not self.frame_flags[index] & FRAME_HAS_PEOPLE:
+            return frame
+
+        people = []
+        for person in range(int(self.people_offsets[index]), int(self.people_offsets[index + 1])):
+            figure = {}
+            for part, key in enumerate(PART_KEYS):
+                flags = int(self.part_flags[person, part])
+                if not flags & PART_PRESENT:
+                    continue
+                part_index = person * len(PART_KEYS) + part
+                rows = self.keypoints[self.part_offsets[part_index]:self.part_offsets[part_index + 1]]
+                int_coords, int_conf = bool(flags & PART_INT_COORDS), bool(flags & PART_INT_CONF)
+                if int_coords == int_conf:
+                    figure[key] = _to_list(rows if flags & PART_NESTED else rows.reshape(-1), int_coords)
+                else:
+                    coords, conf = _to_list(rows[:, :2], int_coords), _to_list(rows[:, 2], int_conf)
+                    figure[key] = [[x, y, c] for (x, y), c in zip(coords, conf)] if flags & PART_NESTED \
+                        else [v for (x, y), c in zip(coords, conf) for v in (x, y, c)]
+            people.append(figure)
+        frame['people'] = people
+        return frame
+
+    def frames(self, indices):
+        return [self.frame(index) for index in indices]
+
+
+JSONL_EXTENSIONS = (".jsonl", ".ndjson")
+INDEX_CHUNK_BYTES = 1 << 20
+
+def _index_lines(path):
+    """(start offsets, 1-based line numbers) of the non-blank lines of path, scanned in chunks."""
+    starts, ends = [np.zeros(1, dtype=np.int64)], []
+    position = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(INDEX_CHUNK_BYTES)
+            if not chunk:
+                break
+            newlines = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == ord("\n")).astype(np.int64) + position
+            ends.append(newlines)
+            starts.append(newlines + 1)
+            position += len(chunk)
+    starts = np.concatenate(starts)
+    ends = np.concatenate(ends + [np.array([position], dtype=np.int64)])
+    # 빈 줄(\r\n의 \r만 남은 줄 포함)은 프레임으로 세지 않는다
+    lengths = ends - starts
+    keep = lengths > 0
+    single = np.flatnonzero(lengths == 1)
+    if len(single):
+        with open(path, 'rb') as f:
+            for i in single:
+                f.seek(int(starts[i]))
+                keep[i] = not f.read(1).isspace()
+    return starts[keep], np.flatnonzero(keep) + 1
+
+
+class JsonlPoseSequence:
+    """
+    Frames of a JSON Lines file, one frame per line, read lazily.
+
+    Opening scans the file once for line offsets without parsing it; frames() then seeks to and parses only
+    the requested lines, so files larger than memory can be used a window at a time.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets, self.line_numbers = _index_lines(path)
+        self._basename = os.path.basename(path)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def filename(self, index):
+        return f"{self._basename}:{self.line_numbers[index]}"
+
+    def frame(self, index):
+        return self.frames([index])[0]
+
+    def frames(self, indices):
+        frames = []
+        with open(self.path, 'rb') as f:
+            for index in indices:
+                f.seek(int(self.offsets[index]))
+                frames.append(json.loads(f.readline()))
+        return frames
+
+
+# 열린 시퀀스마다 메모리 맵이나 줄 인덱스를 들고 있으므로 최근 몇 개만 유지한다
+_open_sequences = LRUCache(8) # 시퀀스 하나를 1로 센다
+
+def open_pose_sequence(path):
+    """
+    PoseSequence for a .poseseq file, or JsonlPoseSequence for a .jsonl/.ndjson file, reusing the mapping or
+    line index of the most recently used files while the file's mtime and size are unchanged.
+    """
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    entry = _open_sequences.get(key)
+    if entry is not None and entry[0] == stamp:
+        return entry[1]
+    sequence = JsonlPoseSequence(path) if path.lower().endswith(JSONL_EXTENSIONS) else PoseSequence(path)
+    # 같은 경로의 이전 항목(다른 stamp)은 덮어써서 바로 놓아준다
+    _open_sequences.put(key, (stamp, sequence), 1)
+    return sequence
+
+def convert_pose_folder(folder_path, output_path, file_pattern="*.json", natural_sort=False, dtype="float32"):
+    """
+    Convert every pose JSON file in folder_path matching file_pattern into one .poseseq file.
+    Files holding a frame list contribute every frame. Returns (frames written, files converted, files skipped).
+    """
+    try:
+        from .pose_io import list_pose_files, read_pose_file
+    except ImportError:
+        from pose_io import list_pose_files, read_pose_file
+
+    # 파일마다 한 번씩만 인코딩해서, 잘못된 파일은 건너뛰고 나머지 조각을 이어 붙인다
+    parts, filenames, skipped = [], [], []
+    for path in list_pose_files(folder_path, file_pattern, True, natural_sort):
+        filename = os.path.basename(path)
+        try:
+            pose_data = read_pose_file(path)
+            file_frames = pose_data if isinstance(pose_data, list) else [pose_data]
+            parts.append(encode_pose_frames(file_frames, [len(filenames)] * len(file_frames), dtype))
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Skipping {filename}: {e}")
+            skipped.append(filename)
+            continue
+        filenames.append(filename)
+
+    written = _write_arrays(output_path, concat_pose_arrays(parts), filenames)
+    return written, len(filenames), len(skipped)
@@ -0,0 +1,50 @@
+import json
+import asyncio
+from aiohttp import web
+from .pose_cache import pose_json_sources
+from .pose_preview import preview_renderer
+from .openpose_editor_nodes import format_pose_json
+
+ROUTE_PREFIX = "/ultimate-openpose"
+
+async def get_pose_json(request):
+    """Full POSE_JSON of a node's last run, for editors whose UI payload only held the first frames."""
+    entry = pose_json_sources.get(request.query.get("node_id", ""))
+    if entry is None:
+        return web.json_response({"error": "no pose output for this node"}, status=404)
+    keypoints, compact = entry
+    # 큰 배치의 직렬화가 서버 이벤트 루프를 막지 않도록 스레드에서 한다
+    text = await asyncio.get_running_loop().run_in_executor(None, format_pose_json, keypoints, compact)
+    return web.Response(text=text, content_type="application/json")
+
+async def post_render_preview(request):
+    """
+    Render a preview PNG of a pose with the editor's parameters, without queueing a prompt.
+
+    The JSON body holds "pose" (a POSE_KEYPOINT frame list or JSON string), optional "params" (editor widget
+    values plus "frame" and "preview_width") and optional "client_id". Answers 204 when a newer request from the
+    same client superseded this one, and 400 for unusable input.
+    """
+    try:
+        body = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return web.json_response({"error": "request body is not JSON"}, status=400)
+    if not isinstance(body, dict) or not body.get("pose"):
+        return web.json_response({"error": "missing pose"}, status=400)
+    params = body.get("params") or {}
+    if not isinstance(params, dict):
+        return web.json_response({"error": "params must be an object"}, status=400)
+
+    client = str(body.get("client_id") or request.remote)
+    try:
+        png = await preview_renderer.render(client, body["pose"], params)
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=400)
+    if png is None:
+        return web.Response(status=204)
+    return web.Response(body=png, content_type="image/png")
+
+def register_routes(routes):
+    """Add this package's HTTP routes to an aiohttp RouteTableDef, e.g. PromptServer.instance.routes."""
+    routes.get(f"{ROUTE_PREFIX}/pose_json")(get_pose_json)
+    routes.post(f"{ROUTE_PREFIX}/render_preview")(post_render_preview)
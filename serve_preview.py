@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Serve this package's HTTP routes from a local aiohttp app instead of ComfyUI's server, for trying the preview
+endpoint without running ComfyUI.
+
+    python serve_preview.py --port 8189
+    curl -X POST localhost:8189/ultimate-openpose/render_preview \\
+         -d '{"pose": [...], "params": {"head_scale": 1.2, "preview_width": 384}}' -o preview.png
+"""
+
+import os
+import sys
+import argparse
+import importlib.util
+from aiohttp import web
+
+# Stub ComfyUI's ProgressBar when running outside of ComfyUI
+try:
+    import comfy.utils
+except ImportError:
+    class MockProgressBar:
+        def __init__(self, total):
+            self.total = total
+        def update(self, n):
+            pass
+
+    sys.modules['comfy'] = type('MockModule', (), {})()
+    sys.modules['comfy.utils'] = type('MockModule', (), {'ProgressBar': MockProgressBar})()
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_package():
+    # ComfyUI처럼 패키지로 불러와야 상대 import가 동작한다
+    spec = importlib.util.spec_from_file_location("openpose_package", os.path.join(PACKAGE_DIR, "__init__.py"),
+                                                  submodule_search_locations=[PACKAGE_DIR])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules["openpose_package"] = package
+    spec.loader.exec_module(package)
+    return importlib.import_module("openpose_package.pose_server")
+
+
+def create_app():
+    """aiohttp application with the same routes the package registers on ComfyUI's server."""
+    pose_server = load_package()
+    routes = web.RouteTableDef()
+    pose_server.register_routes(routes)
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.add_routes(routes)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8189)
+    args = parser.parse_args()
+    web.run_app(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
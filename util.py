@@ -1,9 +1,19 @@
+import os
 import math
 import json
+import warnings
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import matplotlib
 import cv2
 from comfy.utils import ProgressBar
+try:
+    from .pose_cache import content_hash, LRUCache, NO_STAGE_CACHE
+    from .pose_profiler import profile_stage
+    from .pose_constants import RETARGET_MODES
+except ImportError:
+    from pose_cache import content_hash, LRUCache, NO_STAGE_CACHE
+    from pose_profiler import profile_stage
+    from pose_constants import RETARGET_MODES
 
 eps = 0.01
 
@@ -12,551 +22,917 @@ def scale(point, scale_factor, pivot):
     if not isinstance(pivot, np.ndarray): pivot = np.array(pivot)
     return pivot + (point - pivot) * scale_factor
 
+KP = {
+    "Nose": 0, "Neck": 1, "RShoulder": 2, "RElbow": 3, "RWrist": 4,
+    "LShoulder": 5, "LElbow": 6, "LWrist": 7, "RHip": 8, "RKnee": 9,
+    "RAnkle": 10, "LHip": 11, "LKnee": 12, "LAnkle": 13, "REye": 14,
+    "LEye": 15, "REar": 16, "LEar": 17
+}
+
+FACE_KP_GROUPS_INDICES = {
+    "Left_Eye": [42, 43, 44, 45, 46, 47, 69],
+    "Right_Eye": [36, 37, 38, 39, 40, 41, 68],
+    "Left_Eyebrow": [22, 23, 24, 25, 26],
+    "Right_Eyebrow": [17, 18, 19, 20, 21],
+    "Mouth": list(range(48, 68)),
+    "Nose_Face": list(range(27, 36)),
+    "Face_Shape": list(range(0, 17))
+}
+
+FACE_GROUP_SCALE_PARAMS = {
+    "Left_Eye": "left_eye_scale", "Right_Eye": "right_eye_scale",
+    "Left_Eyebrow": "left_eyebrow_scale", "Right_Eyebrow": "right_eyebrow_scale",
+    "Mouth": "mouth_scale", "Nose_Face": "nose_scale_face",
+    "Face_Shape": "face_shape_scale"
+}
+
+# --- 벡터화된 변환 엔진용 신체 부위 정의 ---
+# 각 부위는 (움직이는 관절 인덱스, 기준이 되는 관절 인덱스) 쌍이다.
+HIP_INDICES = [KP["RHip"], KP["LHip"]]
+SHOULDER_INDICES = [KP["RShoulder"], KP["LShoulder"]]
+ARM_INDICES, ARM_ANCHORS = [KP["RElbow"], KP["RWrist"], KP["LElbow"], KP["LWrist"]], [KP["RShoulder"], KP["RShoulder"], KP["LShoulder"], KP["LShoulder"]]
+LEG_INDICES, LEG_ANCHORS = [KP["RKnee"], KP["RAnkle"], KP["LKnee"], KP["LAnkle"]], [0, 0, 1, 1] # HIP_INDICES 기준
+BODY_HEAD_INDICES = [KP["REye"], KP["LEye"], KP["REar"], KP["LEar"]]
+FEET_INDICES = [KP["RAnkle"], KP["LAnkle"]]
+
+def _rowdot(a, b):
+    # np.dot과 같은 반올림을 얻기 위해 matmul을 거친다
+    return (a[..., None, :] @ b[..., :, None])[..., 0, 0]
+
+def _row_norm(a):
+    return np.sqrt(_rowdot(a, a))[..., None]
+
+def _store(out, indices, values, int_mask):
+    # 정수 좌표 입력은 기존 구현처럼 int 배열에 대입될 때 잘려나간다
+    out[..., indices, :] = np.where(int_mask, np.trunc(values), values)
+
+def scale_face_groups(face, face_mask, scales, head_final, nose_final, neck_final, nose_shift):
+    """
+    Move the face with the head, then apply the eye distance/height and per-group face scales.
+    Returns the scaled face points and the final (REye, LEye) body points.
+    """
+    s = scales
+    face_after_head = scale(face + nose_shift, s["head_scale"], nose_final)
+    face_out = face_after_head.copy()
+
+    reye, leye = head_final[..., :1, :], head_final[..., 1:2, :]
+    eye_center = (reye + leye) / 2
+    reye_dist, leye_dist = scale(reye, s["eye_distance_scale"], eye_center), scale(leye, s["eye_distance_scale"], eye_center)
+    right_dist_translation, left_dist_translation = reye_dist - reye, leye_dist - leye
+
+    direction = nose_final - neck_final
+    norm_direction = _row_norm(direction)
+    unit_direction = direction / np.where(norm_direction > eps, norm_direction, 1.0)
+    zero = np.zeros_like(direction)
+    eye_height_offset = np.where(norm_direction > eps, unit_direction * s["eye_height"], zero) if abs(s["eye_height"]) > eps else zero
+    eyebrow_height_offset = np.where(norm_direction > eps, unit_direction * s["eyebrow_height"], zero) if abs(s["eyebrow_height"]) > eps else zero
+
+    group_translations = {
+        "Right_Eye": right_dist_translation + eye_height_offset,
+        "Left_Eye": left_dist_translation + eye_height_offset,
+        "Right_Eyebrow": right_dist_translation + eyebrow_height_offset,
+        "Left_Eyebrow": left_dist_translation + eyebrow_height_offset,
+    }
+
+    eyes_final = np.concatenate([reye_dist, leye_dist], axis=-2) + eye_height_offset
+
+    num_face_points = face.shape[-2]
+    for group_name, indices in FACE_KP_GROUPS_INDICES.items():
+        group_scale_modifier = s[FACE_GROUP_SCALE_PARAMS[group_name]]
+        valid_indices = [idx for idx in indices if idx < num_face_points]
+        if not valid_indices: continue
+
+        points = face_after_head[..., valid_indices, :]
+        if group_name in group_translations:
+            points = points + group_translations[group_name]
+
+        if abs(group_scale_modifier - 1.0) > eps:
+            if group_name == "Face_Shape":
+                pivot = nose_final
+                direction = neck_final - nose_final
+                norm_direction = _row_norm(direction)
+                unit_direction = direction / np.where(norm_direction > eps, norm_direction, 1.0)
+                point_vector = points - pivot
+                parallel_component = _rowdot(point_vector, unit_direction)[..., None] * unit_direction
+                perpendicular_component = point_vector - parallel_component
+                scaled_points = pivot + parallel_component * group_scale_modifier + perpendicular_component
+                points = np.where(norm_direction > eps, scaled_points, points)
+            else:
+                group_mask = face_mask[..., valid_indices, None]
+                pivot = np.sum(points * group_mask, axis=-2, keepdims=True) / np.maximum(np.sum(group_mask, axis=-2, keepdims=True), 1)
+                points = scale(points, group_scale_modifier, pivot)
+
+        face_out[..., valid_indices, :] = points
+    return face_out, eyes_final
+
+def transform_body_arrays(candidate, scales, body_int=False):
+    """
+    Pelvis/torso/shoulder/arm/leg/neck/head scaling of (..., K, 2) bodies, before the overall scale.
+    Returns the scaled body and the head anchors (head_final, nose_final, neck_final, nose_shift) the face follows.
+    """
+    s = scales
+    int_mask = np.asarray(body_int)[..., None, None]
+
+    out = candidate.copy()
+    hips = candidate[..., HIP_INDICES, :]
+    hip_center = (candidate[..., [KP["RHip"]], :] + candidate[..., [KP["LHip"]], :]) / 2
+    hips_final = scale(hips, s["pelvis_scale"], hip_center)
+    _store(out, HIP_INDICES, hips_final, int_mask)
+
+    hip_center_final = (hips_final[..., :1, :] + hips_final[..., 1:, :]) / 2
+    neck_orig = candidate[..., [KP["Neck"]], :]
+    neck_final = scale(neck_orig, s["torso_scale"], hip_center_final)
+    _store(out, [KP["Neck"]], neck_final, int_mask)
+
+    _store(out, SHOULDER_INDICES, neck_final + (candidate[..., SHOULDER_INDICES, :] - neck_orig) * s["shoulder_scale"], int_mask)
+    _store(out, ARM_INDICES, out[..., ARM_ANCHORS, :] + (candidate[..., ARM_INDICES, :] - candidate[..., ARM_ANCHORS, :]) * s["arm_scale"], int_mask)
+    _store(out, LEG_INDICES, hips_final[..., LEG_ANCHORS, :] + (candidate[..., LEG_INDICES, :] - hips[..., LEG_ANCHORS, :]) * s["leg_scale"], int_mask)
+
+    nose_orig = candidate[..., [KP["Nose"]], :]
+    nose_final = neck_final + (nose_orig - neck_orig) * s["neck_scale"]
+    _store(out, [KP["Nose"]], nose_final, int_mask)
+
+    nose_shift = nose_final - nose_orig
+    head_final = scale(candidate[..., BODY_HEAD_INDICES, :] + nose_shift, s["head_scale"], nose_final)
+    _store(out, BODY_HEAD_INDICES, head_final, int_mask)
+    return out, (head_final, nose_final, neck_final, nose_shift)
+
+def transform_hand_arrays(hand, conf, candidate, body, wrist_index, hands_scale):
+    """Scale a (..., 21, 2) hand around its original wrist and move it with the scaled body's wrist; unconfident points go to 0."""
+    if hand.shape[-2] == 0: return hand
+    wrist_orig, wrist_final = candidate[..., [wrist_index], :], body[..., [wrist_index], :]
+    moved = scale(hand, hands_scale, wrist_orig) + (wrist_final - wrist_orig)
+    return np.where(conf[..., None] > 0, moved, 0.0)
+
+def get_overall_transform(candidate, body, overall, H, W, ground_plane_active):
+    """
+    Apply overall_scale to a body from transform_body_arrays. Returns (scaled body, pivot, translation) so the
+    face and hands can be given the same transform with apply_overall_transform; translation is None off the ground plane.
+    """
+    H, W = np.asarray(H, dtype=float), np.asarray(W, dtype=float)
+    if not ground_plane_active:
+        center_pivot = np.stack(np.broadcast_arrays(W * 0.5, H * 0.5), axis=-1)[..., None, :]
+        return scale(body, overall, center_pivot), center_pivot, None
+
+    # 발이 원래 바닥과 떨어져 있던 거리를 유지하도록 발 중심을 기준으로 확대한 뒤 세로로 옮긴다
+    ground_y_coord = H
+    orig_dist_to_ground = ground_y_coord - np.max(candidate[..., FEET_INDICES, 1], axis=-1)
+    feet_pos_pivot = np.mean(body[..., FEET_INDICES, :], axis=-2, keepdims=True)
+    body = scale(body, overall, feet_pos_pivot)
+    vertical_translation = (ground_y_coord - orig_dist_to_ground) - np.max(body[..., FEET_INDICES, 1], axis=-1)
+    translation = np.stack([np.zeros_like(vertical_translation), vertical_translation], axis=-1)[..., None, :]
+    return body + translation, feet_pos_pivot, translation
+
+def apply_overall_transform(points, overall, pivot, translation, is_hand=False):
+    """Give face/hand/eye points the overall transform of their body; hand points at the origin stay put."""
+    if points.shape[-2] == 0: return points
+    if is_hand:
+        points = np.where(np.sum(np.abs(points), axis=-1, keepdims=True) > eps, scale(points, overall, pivot), points)
+    else:
+        points = scale(points, overall, pivot)
+    return points if translation is None else points + translation
+
+def place_eyes(body, eyes, has_face):
+    """Copy of body with the given (REye, LEye) points where the figure has a face."""
+    has_face = np.asarray(has_face)[..., None, None]
+    body = body.copy()
+    body[..., [KP["REye"], KP["LEye"]], :] = np.where(has_face, eyes, body[..., [KP["REye"], KP["LEye"]], :])
+    return body
+
+def transform_pose_arrays(candidate, face, lhand, rhand, scales, H, W, ground_plane_active,
+                          body_int=False, face_mask=None, has_face=True, lhand_conf=None, rhand_conf=None, profiler=None):
+    """
+    Apply the body/face/hand/overall scaling to whole figures at once.
+
+    All arrays carry arbitrary leading batch dimensions: candidate is (..., K, 2), face is (..., N, 2)
+    and the hands are (..., 21, 2), with face_mask / *_conf giving per-point validity. H and W broadcast
+    against the leading dimensions. Returns the scaled (candidate, face, lhand, rhand) arrays.
+    The face group scaling is recorded as its own "face_scaling" stage on profiler when one is given.
+    """
+    s = scales
+    if face_mask is None: face_mask = np.ones(face.shape[:-1], dtype=bool)
+
+    body, anchors = transform_body_arrays(candidate, s, body_int)
+    body_out, pivot, translation = get_overall_transform(candidate, body, s["overall_scale"], H, W, ground_plane_active)
+
+    face_out = face
+    if face.shape[-2] > 0:
+        with profile_stage(profiler, "face_scaling"):
+            face_out, eyes = scale_face_groups(face, face_mask, s, *anchors)
+            face_out = apply_overall_transform(face_out, s["overall_scale"], pivot, translation)
+            # 정수 좌표 입력은 전체 스케일 전에 잘린다 (_store와 같은 규칙)
+            eyes = np.where(np.asarray(body_int)[..., None, None], np.trunc(eyes), eyes)
+            body_out = place_eyes(body_out, apply_overall_transform(eyes, s["overall_scale"], pivot, translation), has_face)
+
+    lhand_out = apply_overall_transform(transform_hand_arrays(lhand, lhand_conf, candidate, body, KP["LWrist"], s["hands_scale"]), s["overall_scale"], pivot, translation, is_hand=True)
+    rhand_out = apply_overall_transform(transform_hand_arrays(rhand, rhand_conf, candidate, body, KP["RWrist"], s["hands_scale"]), s["overall_scale"], pivot, translation, is_hand=True)
+    return body_out, face_out, lhand_out, rhand_out
+
+def normalize_pose_arrays(candidate, face, lhand, rhand, W, H):
+    """Divide scaled keypoints by the canvas size for drawing; hand points at the origin stay put."""
+    W, H = np.asarray(W, dtype=float), np.asarray(H, dtype=float)
+    canvas_size = np.stack(np.broadcast_arrays(W, H), axis=-1)[..., None, :]
+    def normalize_hand(hand):
+        visible = (hand[..., :1] > eps) | (hand[..., 1:] > eps)
+        return np.where(visible, hand / canvas_size, hand)
+    return candidate / canvas_size, face / canvas_size, normalize_hand(lhand), normalize_hand(rhand)
+
+def get_frame_dimensions(image_data, resolution_x):
+    """Return (output_W, output_H, W, H): the canvas size written to the keypoint output and the size the keypoints live in."""
+    # Handle missing canvas dimensions with default values
+    original_H = image_data.get('canvas_height')
+    original_W = image_data.get('canvas_width')
+    
+    # Always ensure we have output dimensions
+    # If resolution_x is specified and valid, use it for width
+    if resolution_x >= 64:
+        # When resolution_x is specified, calculate height maintaining aspect ratio
+        if original_W is not None and original_H is not None:
+            # Preserve aspect ratio from original canvas
+            output_W = resolution_x
+            output_H = int(original_H * (resolution_x / original_W))
+        else:
+            # No original canvas, use default aspect ratio
+            output_W = resolution_x
+            output_H = int(768 * (resolution_x / 512))  # Maintain default 512:768 ratio
+    else:
+        # resolution_x not specified or invalid, use original or defaults
+        output_W = original_W if original_W is not None else 512
+        output_H = original_H if original_H is not None else 768
+    
+    # Ensure dimensions are valid numbers for processing
+    try:
+        H = int(original_H) if original_H is not None else output_H
+        W = int(original_W) if original_W is not None else output_W
+        if H <= 0: H = output_H
+        if W <= 0: W = output_W
+    except (ValueError, TypeError):
+        H, W = output_H, output_W
+    return output_W, output_H, W, H
+
+def get_render_size(frame_dims, resolution_x, preview_width=0):
+    """
+    Return the (H, W) of the rendered image for a frame's get_frame_dimensions() result.
+    A positive preview_width caps the width for draft previews, keeping the aspect ratio.
+    """
+    output_W, output_H, W, H = frame_dims
+    W_scaled = resolution_x if resolution_x >= 64 else W
+    H_scaled = int(H*(W_scaled*1.0/W))
+    if 0 < preview_width < W_scaled:
+        H_scaled, W_scaled = max(1, int(H_scaled * (preview_width / W_scaled))), preview_width
+    return H_scaled, W_scaled
+
+def scale_marker_size(marker_size, factor):
+    """Marker size for an image drawn factor times the full resolution; markers that were drawn stay at least 1px."""
+    if marker_size <= 0 or factor >= 1: return marker_size
+    return max(1, int(round(marker_size * factor)))
+
+class _NullProgressBar:
+    def update(self, value):
+        pass
+
+_NULL_PROGRESS = _NullProgressBar()
+
+_render_pool = None
+_render_pool_workers = None
+
+def get_render_pool(render_workers):
+    """
+    Shared thread pool for frame rendering. The cv2 drawing calls release the GIL, so frames render
+    concurrently; 0 workers means one per CPU core.
+    """
+    global _render_pool, _render_pool_workers
+    workers = render_workers if render_workers > 0 else (os.cpu_count() or 1)
+    if _render_pool is None or _render_pool_workers != workers:
+        if _render_pool is not None: _render_pool.shutdown(wait=False)
+        _render_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="openpose-render")
+        _render_pool_workers = workers
+    return _render_pool
+
+def get_figure_arrays(figure):
+    """
+    Convert one OpenPose person dict into (body, body_int, face, lhand, rhand) arrays of shape (N, 3),
+    or None when the figure has no usable body.
+    """
+    body_raw, face_raw, lhand_raw, rhand_raw = [figure.get(k) or [] for k in ['pose_keypoints_2d', 'face_keypoints_2d', 'hand_left_keypoints_2d', 'hand_right_keypoints_2d']]
+    if not body_raw or len(body_raw) < (KP["LEar"] + 1) * 3: return None
+    body_np = np.array(body_raw, dtype=float).reshape(-1, 3)
+    body_int = np.array(body_raw[0::3] + body_raw[1::3]).dtype.kind in "biu"
+    face_np = np.array(face_raw, dtype=float).reshape(-1, 3) if face_raw else np.zeros((0, 3))
+    lhand_np = np.array(lhand_raw, dtype=float).reshape(-1, 3) if lhand_raw else np.zeros((0, 3))
+    rhand_np = np.array(rhand_raw, dtype=float).reshape(-1, 3) if rhand_raw else np.zeros((0, 3))
+    return body_np, body_int, face_np, lhand_np, rhand_np
+
+def pack_pose_batch(images_data_list):
+    """
+    Pack every usable figure of every frame into padded (frames, people, keypoints, 3) arrays.
+
+    "figure_index" maps each slot back to its index in the frame's 'people' list (-1 for padding) and the
+    *_count arrays hold how many keypoints of each part the slot really has.
+    """
+    frames = []
+    for image_data in images_data_list:
+        figures = image_data.get('people') if isinstance(image_data, dict) else None
+        packed = []
+        for fig_idx, figure in enumerate(figures or []):
+            figure_arrays = get_figure_arrays(figure)
+            if figure_arrays is not None: packed.append((fig_idx,) + figure_arrays)
+        frames.append(packed)
+
+    F = len(frames)
+    P = max((len(packed) for packed in frames), default=0)
+    def part_len(i): return max((fig[i].shape[0] for packed in frames for fig in packed), default=0)
+    K, N, LH, RH = max(part_len(1), len(KP)), part_len(3), part_len(4), part_len(5)
+
+    batch = {
+        "figure_index": np.full((F, P), -1, dtype=int), "body_int": np.zeros((F, P), dtype=bool),
+        "body": np.zeros((F, P, K, 3)), "face": np.zeros((F, P, N, 3)), "lhand": np.zeros((F, P, LH, 3)), "rhand": np.zeros((F, P, RH, 3)),
+    }
+    for key in ("body", "face", "lhand", "rhand"): batch[f"{key}_count"] = np.zeros((F, P), dtype=int)
+    for f, packed in enumerate(frames):
+        for p, (fig_idx, body_np, body_int, face_np, lhand_np, rhand_np) in enumerate(packed):
+            batch["figure_index"][f, p], batch["body_int"][f, p] = fig_idx, body_int
+            for key, arr in (("body", body_np), ("face", face_np), ("lhand", lhand_np), ("rhand", rhand_np)):
+                batch[key][f, p, :len(arr)] = arr
+                batch[f"{key}_count"][f, p] = len(arr)
+    batch["face_mask"] = np.arange(N) < batch["face_count"][..., None]
+    return batch
+
+
+# --- 리타게팅용 신체 비율 계산 ---
+def _get_point(kps_list, index):
+    if index * 3 + 2 >= len(kps_list) or kps_list[index * 3 + 2] == 0:
+        return None
+    return np.array([kps_list[index * 3], kps_list[index * 3 + 1]])
+
+def _calculate_limb_length(kps_list, p1_idx, p2_idx):
+    p1 = _get_point(kps_list, p1_idx)
+    p2 = _get_point(kps_list, p2_idx)
+    if p1 is not None and p2 is not None:
+        return np.linalg.norm(p1 - p2)
+    return 0.0
+
+def _first_person(pose_obj):
+    if not isinstance(pose_obj, list) or not pose_obj or 'people' not in pose_obj[0] or not pose_obj[0]['people']: return None
+    return pose_obj[0]['people'][0]
+
+def _hull_area(points):
+    if len(points) < 3: return 0.0
+    points_for_hull = np.array(points, dtype=np.float32).reshape((-1, 1, 2))
+    hull = cv2.convexHull(points_for_hull)
+    return cv2.contourArea(hull)
+
+def _get_max_arm_length(keypoints):
+    right_arm_len = _calculate_limb_length(keypoints, 2, 3) + _calculate_limb_length(keypoints, 3, 4)
+    left_arm_len = _calculate_limb_length(keypoints, 5, 6) + _calculate_limb_length(keypoints, 6, 7)
+    return max(left_arm_len, right_arm_len)
+
+def _get_max_leg_length(keypoints):
+    right_leg_len = _calculate_limb_length(keypoints, 8, 9) + _calculate_limb_length(keypoints, 9, 10)
+    left_leg_len = _calculate_limb_length(keypoints, 11, 12) + _calculate_limb_length(keypoints, 12, 13)
+    return max(left_leg_len, right_leg_len)
+
+def _get_head_size(keypoints):
+    head_indices = [0, 14, 15, 16, 17]
+    return _hull_area([p for i in head_indices if (p := _get_point(keypoints, i)) is not None])
+
+def _get_torso_length(keypoints):
+    right_hip = _get_point(keypoints, 8)
+    left_hip = _get_point(keypoints, 11)
+    neck = _get_point(keypoints, 1)
+    if right_hip is None or left_hip is None or neck is None: return 0.0
+    hip_midpoint = (right_hip + left_hip) / 2.0
+    return np.linalg.norm(neck - hip_midpoint)
+
+def _get_hand_area(hand_kps_list):
+    if not hand_kps_list: return 0.0
+    return _hull_area([[hand_kps_list[i], hand_kps_list[i+1]] for i in range(0, len(hand_kps_list), 3) if hand_kps_list[i+2] > 0])
+
+# 비율 이름 -> (계산 함수, 면적 여부, 적용할 스케일 이름)
+# 길이 비율은 그대로, 면적 비율은 제곱근을 스케일에 곱한다
+BODY_PROPORTION_METRICS = {
+    "arm_length": (_get_max_arm_length, False, "arm_scale"),
+    "leg_length": (_get_max_leg_length, False, "leg_scale"),
+    "shoulder_width": (lambda kps: _calculate_limb_length(kps, 2, 5), False, "shoulder_scale"),
+    "pelvis_width": (lambda kps: _calculate_limb_length(kps, 8, 11), False, "pelvis_scale"),
+    "neck_length": (lambda kps: _calculate_limb_length(kps, 1, 0), False, "neck_scale"),
+    "head_size": (_get_head_size, True, "head_scale"),
+    "torso_length": (_get_torso_length, False, "torso_scale"),
+}
+
+def get_body_proportions(pose_obj):
+    """
+    Limb lengths, widths and head/hand areas of the first person of the first frame, used for retargeting.
+    Each value is 0.0 when it cannot be measured.
+    """
+    profile = {}
+    for name, (metric, _, _) in BODY_PROPORTION_METRICS.items():
+        try:
+            person = _first_person(pose_obj)
+            keypoints = person.get('pose_keypoints_2d', []) if person is not None else []
+            profile[name] = metric(keypoints) if keypoints else 0.0
+        except (IndexError, TypeError): profile[name] = 0.0
+    try:
+        person = _first_person(pose_obj)
+        profile["hand_size"] = max(_get_hand_area(person.get('hand_left_keypoints_2d', [])), _get_hand_area(person.get('hand_right_keypoints_2d', []))) if person is not None else 0.0
+    except (IndexError, TypeError): profile["hand_size"] = 0.0
+    return profile
+
+_proportion_profile_cache = LRUCache(256) # 프로필 하나를 1로 센다
+
+def get_body_proportion_profile(pose_obj):
+    """
+    get_body_proportions memoized by the content hash of the first person's keypoints, the only part it
+    measures, for reference poses reused across jobs.
+    """
+    try:
+        person = _first_person(pose_obj)
+    except TypeError:
+        person = None
+    # 측정에 쓰이는 첫 번째 인물의 몸/손 키포인트만 해시해 여러 프레임 타깃에서도 해시 비용이 측정보다 작게 한다
+    key = content_hash([person.get(part) for part in ('pose_keypoints_2d', 'hand_left_keypoints_2d', 'hand_right_keypoints_2d')]
+                       if isinstance(person, dict) else None)
+    profile = _proportion_profile_cache.get(key)
+    if profile is None:
+        profile = get_body_proportions(pose_obj)
+        _proportion_profile_cache.put(key, profile, 1)
+    return profile
+
+def retarget_scales(base_scales, source_profile, target_profile):
+    """Multiply each base scale by the target/source ratio of its body measurement when both are available."""
+    final_scales = dict(base_scales)
+    metrics = [(name, is_area, scale_name) for name, (_, is_area, scale_name) in BODY_PROPORTION_METRICS.items()] + [("hand_size", True, "hands_scale")]
+    for name, is_area, scale_name in metrics:
+        source_value, target_value = source_profile[name], target_profile[name]
+        if source_value > 0 and target_value > 0:
+            ratio = target_value / source_value
+            final_scales[scale_name] = base_scales[scale_name] * (math.sqrt(ratio) if is_area else ratio)
+    return final_scales
+
+# 배치 단위 리타게팅: 모든 프레임/인물의 비율을 (frames, people) 배열로 계산한다
+
+def _batch_limb_lengths(body, pairs):
+    """Lengths of the (p1, p2) keypoint pairs for (..., K, 3) body arrays, 0.0 where either point has zero confidence."""
+    p1, p2 = body[..., [a for a, _ in pairs], :], body[..., [b for _, b in pairs], :]
+    valid = (p1[..., 2] != 0) & (p2[..., 2] != 0)
+    return np.where(valid, np.sqrt(np.sum((p1[..., :2] - p2[..., :2]) ** 2, axis=-1)), 0.0)
+
+def get_batch_body_proportions(batch):
+    """
+    The get_body_proportions measurements for every figure of a pack_pose_batch() batch, as (frames, people) arrays.
+    Lengths are computed for the whole batch at once; head and hand areas need a convex hull per figure.
+    Padding slots and unmeasurable values are 0.0.
+    """
+    body = batch["body"]
+    arms = _batch_limb_lengths(body, [(2, 3), (3, 4), (5, 6), (6, 7)])
+    legs = _batch_limb_lengths(body, [(8, 9), (9, 10), (11, 12), (12, 13)])
+    widths = _batch_limb_lengths(body, [(2, 5), (8, 11), (1, 0)])
+
+    neck, rhip, lhip = body[..., 1, :], body[..., 8, :], body[..., 11, :]
+    torso_valid = (neck[..., 2] != 0) & (rhip[..., 2] != 0) & (lhip[..., 2] != 0)
+    torso = np.where(torso_valid, np.sqrt(np.sum((neck[..., :2] - (rhip[..., :2] + lhip[..., :2]) / 2.0) ** 2, axis=-1)), 0.0)
+
+    profile = {
+        "arm_length": np.maximum(arms[..., 0] + arms[..., 1], arms[..., 2] + arms[..., 3]),
+        "leg_length": np.maximum(legs[..., 0] + legs[..., 1], legs[..., 2] + legs[..., 3]),
+        "shoulder_width": widths[..., 0], "pelvis_width": widths[..., 1], "neck_length": widths[..., 2],
+        "head_size": np.zeros(body.shape[:2]), "torso_length": torso, "hand_size": np.zeros(body.shape[:2]),
+    }
+    head = body[..., [0, 14, 15, 16, 17], :]
+    for f, p in zip(*np.nonzero(batch["figure_index"] >= 0)):
+        profile["head_size"][f, p] = _hull_area(head[f, p, head[f, p, :, 2] != 0, :2])
+        hands = [batch[key][f, p, :batch[f"{key}_count"][f, p]] for key in ("lhand", "rhand")]
+        profile["hand_size"][f, p] = max(_hull_area(hand[hand[:, 2] > 0, :2]) for hand in hands)
+    return profile
+
+def median_body_proportions(profile):
+    """Replace each person slot's measurements by their median over the frames where they could be measured."""
+    median_profile = {}
+    for name, values in profile.items():
+        measured = np.where(values > 0, values, np.nan)
+        counts = np.sum(values > 0, axis=0)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning) # 한 번도 측정되지 않은 슬롯은 nan 중앙값 -> 0으로 처리
+            median = np.where(counts > 0, np.nanmedian(measured, axis=0), 0.0)
+        median_profile[name] = np.broadcast_to(median, values.shape)
+    return median_profile
+
+def retarget_scale_arrays(base_scales, source_profile, target_profile):
+    """retarget_scales for (frames, people) arrays of source measurements against one target profile."""
+    final_scales = {}
+    metrics = [(name, is_area, scale_name) for name, (_, is_area, scale_name) in BODY_PROPORTION_METRICS.items()] + [("hand_size", True, "hands_scale")]
+    for name, is_area, scale_name in metrics:
+        source_value, target_value = source_profile[name], target_profile[name]
+        valid = (source_value > 0) & (target_value > 0)
+        ratio = np.where(valid, target_value / np.where(valid, source_value, 1.0), 1.0)
+        final_scales[scale_name] = np.where(valid, base_scales[scale_name] * (np.sqrt(ratio) if is_area else ratio), base_scales[scale_name])
+    return final_scales
+
+def parse_pose_input(pose_json_str, profiler=None):
+    """List of frame dicts from a JSON string or an already parsed POSE_KEYPOINT object (list/dict)."""
+    images_data_list = pose_json_str
+    if isinstance(pose_json_str, str):
+        with profile_stage(profiler, "parse"):
+            images_data_list = json.loads(pose_json_str)
+    if not isinstance(images_data_list, list):
+        images_data_list = [images_data_list]
+    return images_data_list
+
+def compute_retarget_scales(images_data_list, target_pose_keypoint_obj, retarget_mode, base_scales, get_batch, profiler=None):
+    """
+    Retargeted versions of base_scales: floats for first_person, (frames, people) arrays for the per-person modes.
+    get_batch() returns the pack_pose_batch() of images_data_list. Falls back to base_scales when measuring fails.
+    """
+    try:
+        if retarget_mode == "first_person":
+            # 타깃은 보통 고정된 기준 포즈이므로 비율 프로필을 내용 해시로 재사용한다
+            with profile_stage(profiler, "retarget_metrics"):
+                target_profile = get_body_proportion_profile(target_pose_keypoint_obj)
+                source_profile = get_body_proportions(images_data_list)
+                return retarget_scales(base_scales, source_profile, target_profile)
+        batch = get_batch()
+        with profile_stage(profiler, "retarget_metrics"):
+            target_profile = get_body_proportion_profile(target_pose_keypoint_obj)
+            source_profile = get_batch_body_proportions(batch)
+            if retarget_mode == "sequence_median": source_profile = median_body_proportions(source_profile)
+            return retarget_scale_arrays(base_scales, source_profile, target_profile)
+    except (IndexError, TypeError):
+        # 에러 발생 시 원래 값 유지
+        return dict(base_scales)
+
+def assemble_frame(figures, frame_figures, output_W, output_H, render_images):
+    """
+    Build a frame's output keypoint object and, when rendering, its drawing lists from
+    (fig_idx, figure, scaled arrays, normalized arrays) tuples. Returns (keypoint object, drawing data or None).
+    """
+    current_image_people_data_for_output = []
+    all_scaled_candidates_for_drawing, all_scaled_faces_for_drawing, all_scaled_hands_for_drawing = [], [], []
+    final_subset_for_drawing = [[]] 
+
+    for fig_idx, figure, scaled, normalized in frame_figures:
+        body_raw, lhand_raw, rhand_raw = [figure.get(k) or [] for k in ['pose_keypoints_2d', 'hand_left_keypoints_2d', 'hand_right_keypoints_2d']]
+        candidate_list, face_list, lhand_list, rhand_list = [arr.tolist() for arr in scaled]
+
+        body_kps_out_current_fig = [v for (x, y), c in zip(candidate_list, body_raw[2::3]) for v in (x, y, c)]
+        face_kps_out_current_fig = [v for x, y in face_list for v in (x, y, 1.0)]
+        lhand_kps_out_current_fig = [v for (x, y), c in zip(lhand_list, lhand_raw[2::3]) for v in (x, y, c)]
+        rhand_kps_out_current_fig = [v for (x, y), c in zip(rhand_list, rhand_raw[2::3]) for v in (x, y, c)]
+
+        current_image_people_data_for_output.append({
+            "pose_keypoints_2d": body_kps_out_current_fig, "face_keypoints_2d": face_kps_out_current_fig,
+            "hand_left_keypoints_2d": lhand_kps_out_current_fig, "hand_right_keypoints_2d": rhand_kps_out_current_fig,
+        })
+
+        if not render_images: continue
+        candidate_norm_np, face_norm_np, lhand_norm_np, rhand_norm_np = normalized
+        all_scaled_candidates_for_drawing.extend(candidate_norm_np.tolist())
+        if face_list: all_scaled_faces_for_drawing.extend(face_norm_np.tolist())
+        if lhand_list: all_scaled_hands_for_drawing.append(lhand_norm_np.tolist())
+        if rhand_list: all_scaled_hands_for_drawing.append(rhand_norm_np.tolist())
+
+        if fig_idx == 0 and not final_subset_for_drawing[0]:
+            final_subset_for_drawing[0].extend([i if body_raw[i*3+2]>0 else -1 for i in range(len(candidate_list))])
+        else:
+            prev_candidate_count = len(all_scaled_candidates_for_drawing) - len(candidate_list)
+            final_subset_for_drawing.append([prev_candidate_count+i if body_raw[i*3+2]>0 else -1 for i in range(len(candidate_list))])
+
+    current_frame_keypoint_object = { "people": current_image_people_data_for_output, "canvas_width": output_W, "canvas_height": output_H }
+    if not render_images:
+        return current_frame_keypoint_object, None
+
+    drawing = dict(
+        bodies=dict(candidate=all_scaled_candidates_for_drawing, subset=final_subset_for_drawing),
+        faces=all_scaled_faces_for_drawing, hands=all_scaled_hands_for_drawing,
+        face_exists=any(fig.get('face_keypoints_2d') for fig in figures),
+        hands_exist=any(fig.get('hand_left_keypoints_2d') or fig.get('hand_right_keypoints_2d') for fig in figures),
+    )
+    return current_frame_keypoint_object, drawing
+
 def draw_pose_json(pose_json_str, resolution_x, use_ground_plane, show_body, show_face, show_hands,
                    pose_marker_size, face_marker_size, hand_marker_size,
                    pelvis_scale, torso_scale, neck_scale, head_scale, eye_distance_scale, eye_height, eyebrow_height,
                    left_eye_scale, right_eye_scale, left_eyebrow_scale, right_eyebrow_scale,
                    mouth_scale, nose_scale_face, face_shape_scale,
                    shoulder_scale, arm_scale, leg_scale, hands_scale, overall_scale,
-                   target_pose_keypoint_obj=None):
-
-    # 최종적으로 적용될 스케일 값을 초기화
-    final_hands_scale = hands_scale
-    final_torso_scale = torso_scale
-    final_head_scale = head_scale
-    final_neck_scale = neck_scale
-    final_pelvis_scale = pelvis_scale
-    final_shoulder_scale = shoulder_scale
-    final_arm_scale = arm_scale
-    final_leg_scale = leg_scale
-
-    if target_pose_keypoint_obj and pose_json_str:
-        try:
-            source_pose_obj = json.loads(pose_json_str)
-
-            # --- 공용 헬퍼 함수 정의 ---
-            def get_point(kps_list, index):
-                if index * 3 + 2 >= len(kps_list) or kps_list[index * 3 + 2] == 0:
-                    return None
-                return np.array([kps_list[index * 3], kps_list[index * 3 + 1]])
-
-            def calculate_limb_length(kps_list, p1_idx, p2_idx):
-                p1 = get_point(kps_list, p1_idx)
-                p2 = get_point(kps_list, p2_idx)
-                if p1 is not None and p2 is not None:
-                    return np.linalg.norm(p1 - p2)
-                return 0.0
-            
-            # --- 팔 길이 계산 ---
-            def get_max_arm_length(pose_obj):
-                try:
-                    if not isinstance(pose_obj, list) or not pose_obj or 'people' not in pose_obj[0] or not pose_obj[0]['people']: return 0.0
-                    keypoints = pose_obj[0]['people'][0].get('pose_keypoints_2d', [])
-                    if not keypoints: return 0.0
-                    right_arm_len = calculate_limb_length(keypoints, 2, 3) + calculate_limb_length(keypoints, 3, 4)
-                    left_arm_len = calculate_limb_length(keypoints, 5, 6) + calculate_limb_length(keypoints, 6, 7)
-                    return max(left_arm_len, right_arm_len)
-                except (IndexError, TypeError): return 0.0
-
-            target_arm_len = get_max_arm_length(target_pose_keypoint_obj)
-            source_arm_len = get_max_arm_length(source_pose_obj)
-
-            if source_arm_len > 0 and target_arm_len > 0:
-                final_arm_scale = arm_scale * (target_arm_len / source_arm_len)
-
-            # --- 다리 길이 계산 ---
-            def get_max_leg_length(pose_obj):
-                try:
-                    if not isinstance(pose_obj, list) or not pose_obj or 'people' not in pose_obj[0] or not pose_obj[0]['people']: return 0.0
-                    keypoints = pose_obj[0]['people'][0].get('pose_keypoints_2d', [])
-                    if not keypoints: return 0.0
-                    right_leg_len = calculate_limb_length(keypoints, 8, 9) + calculate_limb_length(keypoints, 9, 10)
-                    left_leg_len = calculate_limb_length(keypoints, 11, 12) + calculate_limb_length(keypoints, 12, 13)
-                    return max(left_leg_len, right_leg_len)
-                except (IndexError, TypeError): return 0.0
-            
-            target_leg_len = get_max_leg_length(target_pose_keypoint_obj)
-            source_leg_len = get_max_leg_length(source_pose_obj)
-
-            if source_leg_len > 0 and target_leg_len > 0:
-                final_leg_scale = leg_scale * (target_leg_len / source_leg_len)
-            
-            # --- 어깨 너비 계산 ---
-            def get_shoulder_width(pose_obj):
-                try:
-                    if not isinstance(pose_obj, list) or not pose_obj or 'people' not in pose_obj[0] or not pose_obj[0]['people']: return 0.0
-                    keypoints = pose_obj[0]['people'][0].get('pose_keypoints_2d', [])
-                    if not keypoints: return 0.0
-                    width = calculate_limb_length(keypoints, 2, 5)
-                    return width
-                except (IndexError, TypeError): return 0.0
-
-            target_shoulder_width = get_shoulder_width(target_pose_keypoint_obj)
-            source_shoulder_width = get_shoulder_width(source_pose_obj)
-            
-            if source_shoulder_width > 0 and target_shoulder_width > 0:
-                final_shoulder_scale = shoulder_scale * (target_shoulder_width / source_shoulder_width)
-
-            # --- 골반 너비 계산 ---
-            def get_pelvis_width(pose_obj):
-                try:
-                    if not isinstance(pose_obj, list) or not pose_obj or 'people' not in pose_obj[0] or not pose_obj[0]['people']: return 0.0
-                    keypoints = pose_obj[0]['people'][0].get('pose_keypoints_2d', [])
-                    if not keypoints: return 0.0
-                    width = calculate_limb_length(keypoints, 8, 11)
-                    return width
-                except (IndexError, TypeError): return 0.0
-            
-            target_pelvis_width = get_pelvis_width(target_pose_keypoint_obj)
-            source_pelvis_width = get_pelvis_width(source_pose_obj)
-
-            if source_pelvis_width > 0 and target_pelvis_width > 0:
-                final_pelvis_scale = pelvis_scale * (target_pelvis_width / source_pelvis_width)
-            
-            # --- 목 길이 계산 ---
-            def get_neck_length(pose_obj):
-                try:
-                    if not isinstance(pose_obj, list) or not pose_obj or 'people' not in pose_obj[0] or not pose_obj[0]['people']: return 0.0
-                    keypoints = pose_obj[0]['people'][0].get('pose_keypoints_2d', [])
-                    if not keypoints: return 0.0
-                    length = calculate_limb_length(keypoints, 1, 0)
-                    return length
-                except (IndexError, TypeError): return 0.0
-
-            target_neck_length = get_neck_length(target_pose_keypoint_obj)
-            source_neck_length = get_neck_length(source_pose_obj)
-
-            if source_neck_length > 0 and target_neck_length > 0:
-                final_neck_scale = neck_scale * (target_neck_length / source_neck_length)
-                
-            # --- 머리 크기 계산 ---
-            def get_head_size(pose_obj):
-                try:
-                    if not isinstance(pose_obj, list) or not pose_obj or 'people' not in pose_obj[0] or not pose_obj[0]['people']: return 0.0
-                    keypoints = pose_obj[0]['people'][0].get('pose_keypoints_2d', [])
-                    if not keypoints: return 0.0
-                    
-                    head_indices = [0, 14, 15, 16, 17]
-                    valid_points = [p for i in head_indices if (p := get_point(keypoints, i)) is not None]
-
-                    if len(valid_points) < 3: return 0.0
-
-                    points_for_hull = np.array(valid_points, dtype=np.float32).reshape((-1, 1, 2))
-                    hull = cv2.convexHull(points_for_hull)
-                    area = cv2.contourArea(hull)
-                    return area
-                except (IndexError, TypeError): return 0.0
-
-            target_head_size = get_head_size(target_pose_keypoint_obj)
-            source_head_size = get_head_size(source_pose_obj)
-
-            if source_head_size > 0 and target_head_size > 0:
-                size_ratio = math.sqrt(target_head_size / source_head_size)
-                final_head_scale = head_scale * size_ratio
-
-            # --- 몸통 길이 계산 ---
-            def get_torso_length(pose_obj):
-                try:
-                    if not isinstance(pose_obj, list) or not pose_obj or 'people' not in pose_obj[0] or not pose_obj[0]['people']: return 0.0
-                    keypoints = pose_obj[0]['people'][0].get('pose_keypoints_2d', [])
-                    if not keypoints: return 0.0
-                    
-                    right_hip = get_point(keypoints, 8)
-                    left_hip = get_point(keypoints, 11)
-                    neck = get_point(keypoints, 1)
-
-                    if right_hip is None or left_hip is None or neck is None: return 0.0
-                    
-                    hip_midpoint = (right_hip + left_hip) / 2.0
-                    length = np.linalg.norm(neck - hip_midpoint)
-                    return length
-                except (IndexError, TypeError): return 0.0
-            
-            target_torso_length = get_torso_length(target_pose_keypoint_obj)
-            source_torso_length = get_torso_length(source_pose_obj)
-            
-            if source_torso_length > 0 and target_torso_length > 0:
-                final_torso_scale = torso_scale * (target_torso_length / source_torso_length)
-                
-            # --- 손 크기 계산 (새로 추가된 부분) ---
-            def get_hand_area(hand_kps_list):
-                if not hand_kps_list: return 0.0
-                valid_points = []
-                for i in range(0, len(hand_kps_list), 3):
-                    if hand_kps_list[i+2] > 0:
-                        valid_points.append([hand_kps_list[i], hand_kps_list[i+1]])
-                if len(valid_points) < 3: return 0.0
-                points_for_hull = np.array(valid_points, dtype=np.float32).reshape((-1, 1, 2))
-                hull = cv2.convexHull(points_for_hull)
-                return cv2.contourArea(hull)
-
-            def get_max_hand_size(pose_obj):
-                try:
-                    if not isinstance(pose_obj, list) or not pose_obj or 'people' not in pose_obj[0] or not pose_obj[0]['people']: return 0.0
-                    person = pose_obj[0]['people'][0]
-                    left_hand_kps = person.get('hand_left_keypoints_2d', [])
-                    right_hand_kps = person.get('hand_right_keypoints_2d', [])
-                    left_area = get_hand_area(left_hand_kps)
-                    right_area = get_hand_area(right_hand_kps)
-                    return max(left_area, right_area)
-                except(IndexError, TypeError): return 0.0
-
-            target_hand_size = get_max_hand_size(target_pose_keypoint_obj)
-            source_hand_size = get_max_hand_size(source_pose_obj)
-
-            if source_hand_size > 0 and target_hand_size > 0:
-                size_ratio = math.sqrt(target_hand_size / source_hand_size)
-                final_hands_scale = hands_scale * size_ratio
-
-
-        except (json.JSONDecodeError, IndexError, TypeError):
-            # 에러 발생 시 원래 값 유지
-            final_hands_scale = hands_scale
-            final_torso_scale = torso_scale
-            final_head_scale = head_scale
-            final_neck_scale = neck_scale
-            final_pelvis_scale = pelvis_scale
-            final_shoulder_scale = shoulder_scale
-            final_arm_scale = arm_scale
-            final_leg_scale = leg_scale
-
-    pose_imgs = []
-    all_frames_keypoints_output = []
-
-    if pose_json_str:
-        try:
-            images_data_list = json.loads(pose_json_str)
-            if not isinstance(images_data_list, list): 
-                images_data_list = [images_data_list]
-        except json.JSONDecodeError as e:
-            print(f"Error parsing JSON: {e}")
-            return [], []
-
-        pbar = ProgressBar(len(images_data_list))
-        
-        KP = {
-            "Nose": 0, "Neck": 1, "RShoulder": 2, "RElbow": 3, "RWrist": 4,
-            "LShoulder": 5, "LElbow": 6, "LWrist": 7, "RHip": 8, "RKnee": 9,
-            "RAnkle": 10, "LHip": 11, "LKnee": 12, "LAnkle": 13, "REye": 14,
-            "LEye": 15, "REar": 16, "LEar": 17
-        }
-        
-        FACE_KP_GROUPS_INDICES = {
-            "Left_Eye": [42, 43, 44, 45, 46, 47, 69],
-            "Right_Eye": [36, 37, 38, 39, 40, 41, 68],
-            "Left_Eyebrow": [22, 23, 24, 25, 26],
-            "Right_Eyebrow": [17, 18, 19, 20, 21],
-            "Mouth": list(range(48, 68)),
-            "Nose_Face": list(range(27, 36)),
-            "Face_Shape": list(range(0, 17))
-        }
-        
-        INDIVIDUAL_FACE_SCALES = {
-            "Left_Eye": left_eye_scale, "Right_Eye": right_eye_scale,
-            "Left_Eyebrow": left_eyebrow_scale, "Right_Eyebrow": right_eyebrow_scale,
-            "Mouth": mouth_scale, "Nose_Face": nose_scale_face,
-            "Face_Shape": face_shape_scale
-        }
-
-        BODY_HEAD_PARTS = {KP["REye"], KP["LEye"], KP["REar"], KP["LEar"]}
-        R_LEG_INDICES = {KP["RKnee"], KP["RAnkle"]}
-        L_LEG_INDICES = {KP["LKnee"], KP["LAnkle"]}
-        FEET_INDICES = {KP["RAnkle"], KP["LAnkle"]}
-
-        for image_data in images_data_list:
+                   target_pose_keypoint_obj=None, batch_mode=False, render_workers=1, output_dtype=np.uint8, use_stamp_cache=False,
+                   render_images=True, profiler=None, retarget_mode="first_person", preview_width=0, stage_cache=None, show_progress=True):
+
+    # profiler(StageProfiler)가 주어지면 파싱/리타겟/스케일링/정규화/조립/래스터 단계별 시간을 기록한다
+    # retarget_mode: first_person은 첫 프레임 첫 인물의 비율로 모든 인물을 같은 비율로 리타게팅하고,
+    # per_person은 프레임마다 인물마다, sequence_median은 인물별로 전체 프레임의 중앙값 비율로 리타게팅한다
+    # preview_width > 0이면 그 폭 이하로 축소해 그리고 마커 크기도 같은 비율로 줄인다 (키포인트 출력은 그대로)
+    # stage_cache(StageCache)가 주어지면 파싱 → 리타겟 → 몸 → 얼굴 → 손 → 조립 결과를 단계별 입력으로 키를 만들어 재사용하며,
+    # 이때는 batch_mode와 같은 배열 경로로 계산한다. 마커 크기나 show_* 옵션만 바뀌면 래스터만 다시 한다
+    # pose_json_str은 JSON 문자열이거나 이미 파싱된 POSE_KEYPOINT 객체(list/dict)이며, 문자열은 여기서 한 번만 파싱한다
+    if retarget_mode not in RETARGET_MODES:
+        raise ValueError(f"Unknown retarget_mode '{retarget_mode}', expected one of {RETARGET_MODES}")
+    if not pose_json_str:
+        return [], []
+
+    stages = NO_STAGE_CACHE if stage_cache is None else stage_cache
+    pose_key = stages.key(pose_json_str)
+    try:
+        images_data_list = stages.run("parse", pose_key, lambda: parse_pose_input(pose_json_str, profiler))
+    except json.JSONDecodeError as e:
+        print(f"Error parsing JSON: {e}")
+        return [], []
+    if not images_data_list:
+        return [], []
+
+    packed = []
+    def get_batch():
+        # 리타겟과 배치 변환이 같은 패킹 결과를 한 번만 만들어 쓴다
+        if not packed:
+            def pack():
+                with profile_stage(profiler, "parse"):
+                    return pack_pose_batch(images_data_list)
+            packed.append(stages.run("pack", pose_key, pack))
+        return packed[0]
+
+    # 최종적으로 적용될 스케일 값 (리타게팅 대상 스케일은 타깃 비율로 보정된다)
+    base_scales = dict(arm_scale=arm_scale, leg_scale=leg_scale, shoulder_scale=shoulder_scale, pelvis_scale=pelvis_scale,
+                       neck_scale=neck_scale, head_scale=head_scale, torso_scale=torso_scale, hands_scale=hands_scale)
+    final_scales, retarget_key = base_scales, None
+    if target_pose_keypoint_obj:
+        retarget_key = stages.key(pose_key, target_pose_keypoint_obj, retarget_mode, base_scales)
+        final_scales = stages.run("retarget", retarget_key, lambda: compute_retarget_scales(
+            images_data_list, target_pose_keypoint_obj, retarget_mode, base_scales, get_batch, profiler))
+    # 인물별 리타게팅 모드에서 (frames, people) 배열로 계산된 스케일 (그 외에는 None)
+    person_scales = final_scales if isinstance(final_scales["arm_scale"], np.ndarray) else None
+
+    # show_progress=False는 프롬프트 실행 밖(서버 미리보기 등)에서 ComfyUI 진행률을 건드리지 않기 위한 것
+    pbar = ProgressBar(len(images_data_list)) if show_progress else _NULL_PROGRESS
+
+    figure_scales = dict(base_scales if person_scales is not None else final_scales,
+        overall_scale=overall_scale,
+        eye_distance_scale=eye_distance_scale, eye_height=eye_height, eyebrow_height=eyebrow_height,
+        left_eye_scale=left_eye_scale, right_eye_scale=right_eye_scale,
+        left_eyebrow_scale=left_eyebrow_scale, right_eyebrow_scale=right_eyebrow_scale,
+        mouth_scale=mouth_scale, nose_scale_face=nose_scale_face, face_shape_scale=face_shape_scale,
+    )
+    face_param_names = ("eye_distance_scale", "eye_height", "eyebrow_height", "left_eye_scale", "right_eye_scale",
+                        "left_eyebrow_scale", "right_eyebrow_scale", "mouth_scale", "nose_scale_face", "face_shape_scale")
+
+    scales_to_check = [leg_scale, torso_scale, overall_scale, pelvis_scale, head_scale]
+    ground_plane_active = use_ground_plane and any(abs(s - 1.0) > 0.001 for s in scales_to_check)
+
+    frame_dims = [get_frame_dimensions(image_data, resolution_x) if isinstance(image_data, dict) else None for image_data in images_data_list]
+
+    if batch_mode or stage_cache is not None:
+        batch = get_batch()
+        if person_scales is not None:
+            # 인물별 스케일은 (frames, people, 1, 1)로 키포인트 배열에 브로드캐스트된다
+            figure_scales.update({name: values[..., None, None] for name, values in person_scales.items()})
+        batch_W = np.array([dims[2] if dims else 1 for dims in frame_dims], dtype=float)[:, None]
+        batch_H = np.array([dims[3] if dims else 1 for dims in frame_dims], dtype=float)[:, None]
+        candidate = batch["body"][..., :2]
+
+        body_key = stages.key(pose_key, retarget_key, resolution_x, base_scales, overall_scale, ground_plane_active)
+        def body_stage():
+            with profile_stage(profiler, "figure_scaling"):
+                body, anchors = transform_body_arrays(candidate, figure_scales, batch["body_int"])
+                return (body, anchors) + get_overall_transform(candidate, body, overall_scale, batch_H, batch_W, ground_plane_active)
+        body, anchors, body_out, pivot, translation = stages.run("body", body_key, body_stage)
+
+        face_key = stages.key(body_key, [figure_scales[name] for name in face_param_names])
+        def face_stage():
+            if batch["face"].shape[-2] == 0: return batch["face"][..., :2], body_out
+            with profile_stage(profiler, "face_scaling"):
+                face_out, eyes = scale_face_groups(batch["face"][..., :2], batch["face_mask"], figure_scales, *anchors)
+                face_out = apply_overall_transform(face_out, overall_scale, pivot, translation)
+                # 정수 좌표 입력은 전체 스케일 전에 잘린다 (_store와 같은 규칙)
+                eyes = np.where(batch["body_int"][..., None, None], np.trunc(eyes), eyes)
+                return face_out, place_eyes(body_out, apply_overall_transform(eyes, overall_scale, pivot, translation), batch["face_count"] > 0)
+        face_out, body_out = stages.run("face", face_key, face_stage)
+
+        hand_key = stages.key(body_key, hands_scale)
+        def hand_stage():
+            with profile_stage(profiler, "figure_scaling"):
+                return tuple(apply_overall_transform(transform_hand_arrays(batch[key][..., :2], batch[key][..., 2], candidate, body, wrist_index, figure_scales["hands_scale"]),
+                                                     overall_scale, pivot, translation, is_hand=True)
+                             for key, wrist_index in (("lhand", KP["LWrist"]), ("rhand", KP["RWrist"])))
+        lhand_out, rhand_out = stages.run("hand", hand_key, hand_stage)
+        batch_scaled = (body_out, face_out, lhand_out, rhand_out)
+
+    def assemble_frames():
+        # 프레임마다 (출력 키포인트 객체, 그리기용 데이터), 그릴 수 없는 프레임은 None
+        if batch_mode or stage_cache is not None:
+            with profile_stage(profiler, "normalization"):
+                batch_normalized = normalize_pose_arrays(*batch_scaled, batch_W, batch_H) if render_images else None
+
+        frames = []
+        for frame_idx, image_data in enumerate(images_data_list):
             # Validate and ensure required keys exist
             if not isinstance(image_data, dict):
                 print(f"Warning: Invalid image_data type: {type(image_data)}, skipping...")
-                pbar.update(1)
+                frames.append(None)
                 continue
                 
             if 'people' not in image_data or not image_data['people']:
-                pbar.update(1)
+                frames.append(None)
                 continue
             
             figures = image_data['people']
-            # Handle missing canvas dimensions with default values
-            original_H = image_data.get('canvas_height')
-            original_W = image_data.get('canvas_width')
-            
-            # Always ensure we have output dimensions
-            # If resolution_x is specified and valid, use it for width
-            if resolution_x >= 64:
-                # When resolution_x is specified, calculate height maintaining aspect ratio
-                if original_W is not None and original_H is not None:
-                    # Preserve aspect ratio from original canvas
-                    output_W = resolution_x
-                    output_H = int(original_H * (resolution_x / original_W))
-                else:
-                    # No original canvas, use default aspect ratio
-                    output_W = resolution_x
-                    output_H = int(768 * (resolution_x / 512))  # Maintain default 512:768 ratio
+            output_W, output_H, W, H = frame_dims[frame_idx]
+
+            # (fig_idx, figure, scaled arrays, normalized arrays) per drawable figure
+            frame_figures = []
+            if batch_mode or stage_cache is not None:
+                for slot, fig_idx in enumerate(batch["figure_index"][frame_idx]):
+                    if fig_idx < 0: break
+                    counts = [batch[k][frame_idx, slot] for k in ("body_count", "face_count", "lhand_count", "rhand_count")]
+                    frame_figures.append((fig_idx, figures[fig_idx],
+                                          [arr[frame_idx, slot, :n] for arr, n in zip(batch_scaled, counts)],
+                                          [arr[frame_idx, slot, :n] for arr, n in zip(batch_normalized, counts)] if render_images else None))
             else:
-                # resolution_x not specified or invalid, use original or defaults
-                output_W = original_W if original_W is not None else 512
-                output_H = original_H if original_H is not None else 768
-            
-            # Ensure dimensions are valid numbers for processing
-            try:
-                H = int(original_H) if original_H is not None else output_H
-                W = int(original_W) if original_W is not None else output_W
-                if H <= 0: H = output_H
-                if W <= 0: W = output_W
-            except (ValueError, TypeError):
-                H, W = output_H, output_W
-            
-            current_image_people_data_for_output = []
-            all_scaled_candidates_for_drawing, all_scaled_faces_for_drawing, all_scaled_hands_for_drawing = [], [], []
-            final_subset_for_drawing = [[]] 
-            
-            for fig_idx, figure in enumerate(figures):
-                body_raw, face_raw, lhand_raw, rhand_raw = [figure.get(k, []) for k in ['pose_keypoints_2d', 'face_keypoints_2d', 'hand_left_keypoints_2d', 'hand_right_keypoints_2d']]
-
-                if not body_raw or len(body_raw) < (KP["LEar"] + 1) * 3: continue
-                
-                initial_candidate = np.array([body_raw[i:i+2] for i in range(0, len(body_raw), 3)])
-                confidence_scores_body = [body_raw[i*3+2] for i in range(len(initial_candidate))]
-                scaled_candidate_np = initial_candidate.copy()
-
-                r_hip_orig, l_hip_orig = initial_candidate[KP["RHip"]], initial_candidate[KP["LHip"]]
-                hip_center_orig = (r_hip_orig + l_hip_orig) / 2 
-                neck_orig, r_shoulder_orig, l_shoulder_orig, nose_orig = [initial_candidate[KP[k]] for k in ["Neck", "RShoulder", "LShoulder", "Nose"]]
-                lwrist_orig, rwrist_orig = initial_candidate[KP["LWrist"]], initial_candidate[KP["RWrist"]]
-
-                r_hip_final = scale(r_hip_orig, final_pelvis_scale, hip_center_orig)
-                l_hip_final = scale(l_hip_orig, final_pelvis_scale, hip_center_orig)
-                scaled_candidate_np[KP["RHip"]], scaled_candidate_np[KP["LHip"]] = r_hip_final, l_hip_final
-                
-                hip_center_final = (r_hip_final + l_hip_final) / 2
-                neck_final = scale(neck_orig, final_torso_scale, hip_center_final)
-                scaled_candidate_np[KP["Neck"]] = neck_final
-
-                scaled_candidate_np[KP["RShoulder"]] = neck_final + (r_shoulder_orig - neck_orig) * final_shoulder_scale
-                scaled_candidate_np[KP["LShoulder"]] = neck_final + (l_shoulder_orig - neck_orig) * final_shoulder_scale
-                
-                r_shoulder_final, l_shoulder_final = scaled_candidate_np[KP["RShoulder"]], scaled_candidate_np[KP["LShoulder"]]
-                
-                for i in [KP["RElbow"], KP["RWrist"]]: scaled_candidate_np[i] = r_shoulder_final + (initial_candidate[i] - r_shoulder_orig) * final_arm_scale
-                for i in [KP["LElbow"], KP["LWrist"]]: scaled_candidate_np[i] = l_shoulder_final + (initial_candidate[i] - l_shoulder_orig) * final_arm_scale
-                
-                for i in R_LEG_INDICES: scaled_candidate_np[i] = r_hip_final + (initial_candidate[i] - r_hip_orig) * final_leg_scale
-                for i in L_LEG_INDICES: scaled_candidate_np[i] = l_hip_final + (initial_candidate[i] - l_hip_orig) * final_leg_scale
-                
-                nose_body_final = neck_final + (nose_orig - neck_orig) * final_neck_scale
-                scaled_candidate_np[KP["Nose"]] = nose_body_final
-                
-                effective_nose_translation = nose_body_final - nose_orig
-                for i in BODY_HEAD_PARTS:
-                    part_moved_with_nose = initial_candidate[i] + effective_nose_translation
-                    scaled_candidate_np[i] = scale(part_moved_with_nose, final_head_scale, nose_body_final)
-
-                face_points_scaled_current_fig = []
-                if face_raw:
-                    face_points_orig = [np.array(face_raw[i:i+2]) for i in range(0, len(face_raw), 3)]
-                    num_face_points = len(face_points_orig)
-                    
-                    face_points_positioned = [p + effective_nose_translation for p in face_points_orig]
-                    face_points_after_global_head_scale = [scale(p, final_head_scale, nose_body_final) for p in face_points_positioned]
-                    face_points_scaled_current_fig = list(face_points_after_global_head_scale)
-
-                    reye_pos_after_head_scale = scale(initial_candidate[KP["REye"]] + effective_nose_translation, final_head_scale, nose_body_final)
-                    leye_pos_after_head_scale = scale(initial_candidate[KP["LEye"]] + effective_nose_translation, final_head_scale, nose_body_final)
-                    eye_center = (reye_pos_after_head_scale + leye_pos_after_head_scale) / 2
-                    reye_pos_after_dist_scale = scale(reye_pos_after_head_scale, eye_distance_scale, eye_center)
-                    leye_pos_after_dist_scale = scale(leye_pos_after_head_scale, eye_distance_scale, eye_center)
-                    right_dist_translation = reye_pos_after_dist_scale - reye_pos_after_head_scale
-                    left_dist_translation = leye_pos_after_dist_scale - leye_pos_after_head_scale
-
-                    eye_height_offset = np.array([0.0, 0.0])
-                    eyebrow_height_offset = np.array([0.0, 0.0])
-                    direction_vector = nose_body_final - neck_final
-                    norm_direction = np.linalg.norm(direction_vector)
-                    if norm_direction > eps:
-                        unit_direction = direction_vector / norm_direction
-                        if abs(eye_height) > eps: eye_height_offset = unit_direction * eye_height
-                        if abs(eyebrow_height) > eps: eyebrow_height_offset = unit_direction * eyebrow_height
-                    
-                    group_translations = {
-                        "Right_Eye": right_dist_translation + eye_height_offset,
-                        "Left_Eye": left_dist_translation + eye_height_offset,
-                        "Right_Eyebrow": right_dist_translation + eyebrow_height_offset,
-                        "Left_Eyebrow": left_dist_translation + eyebrow_height_offset,
-                    }
-
-                    scaled_candidate_np[KP["REye"]] = reye_pos_after_dist_scale + eye_height_offset
-                    scaled_candidate_np[KP["LEye"]] = leye_pos_after_dist_scale + eye_height_offset
-                    
-                    for group_name, indices in FACE_KP_GROUPS_INDICES.items():
-                        group_scale_modifier = INDIVIDUAL_FACE_SCALES.get(group_name, 1.0)
-                        valid_indices = [idx for idx in indices if idx < num_face_points]
-                        if not valid_indices: continue
-
-                        points_after_head_scale = [face_points_after_global_head_scale[idx] for idx in valid_indices]
-
-                        if group_name in group_translations:
-                            points_after_translation = [p + group_translations[group_name] for p in points_after_head_scale]
-                        else:
-                            points_after_translation = points_after_head_scale
-
-                        if abs(group_scale_modifier - 1.0) > eps:
-                            if group_name == "Face_Shape":
-                                pivot = nose_body_final
-                                direction_vector = neck_final - nose_body_final
-                                norm_direction = np.linalg.norm(direction_vector)
-                                if norm_direction > eps:
-                                    unit_direction = direction_vector / norm_direction
-                                    final_points = []
-                                    for p in points_after_translation:
-                                        point_vector = p - pivot
-                                        proj_length = np.dot(point_vector, unit_direction)
-                                        parallel_component = proj_length * unit_direction
-                                        perpendicular_component = point_vector - parallel_component
-                                        scaled_parallel_component = parallel_component * group_scale_modifier
-                                        new_point = pivot + scaled_parallel_component + perpendicular_component
-                                        final_points.append(new_point)
-                                else:
-                                    final_points = points_after_translation
-                            else:
-                                pivot = np.mean(points_after_translation, axis=0)
-                                final_points = [scale(p, group_scale_modifier, pivot) for p in points_after_translation]
-                        else:
-                            final_points = points_after_translation
-
-                        for i, idx in enumerate(valid_indices):
-                            face_points_scaled_current_fig[idx] = final_points[i]
-                
-                lwrist_final_calc, rwrist_final_calc = scaled_candidate_np[KP["LWrist"]], scaled_candidate_np[KP["RWrist"]]
-                
-                # hands_scale 대신 계산된 final_hands_scale을 사용하도록 수정
-                lhand_scaled_current_fig = [(scale(np.array(lhand_raw[i:i+2]), final_hands_scale, lwrist_orig) + (lwrist_final_calc - lwrist_orig)) if lhand_raw[i+2] > 0 else np.array([0.0, 0.0]) for i in range(0, len(lhand_raw), 3)] if lhand_raw else []
-                rhand_scaled_current_fig = [(scale(np.array(rhand_raw[i:i+2]), final_hands_scale, rwrist_orig) + (rwrist_final_calc - rwrist_orig)) if rhand_raw[i+2] > 0 else np.array([0.0, 0.0]) for i in range(0, len(rhand_raw), 3)] if rhand_raw else []
+                slot = 0
+                for fig_idx, figure in enumerate(figures):
+                    with profile_stage(profiler, "parse"):
+                        figure_arrays = get_figure_arrays(figure)
+                    if figure_arrays is None: continue
+                    body_np, body_int, face_np, lhand_np, rhand_np = figure_arrays
+                    current_scales = figure_scales
+                    if person_scales is not None:
+                        # pack_pose_batch와 같은 순서로 유효한 인물마다 슬롯이 하나씩 배정된다
+                        current_scales = dict(figure_scales, **{name: float(values[frame_idx, slot]) for name, values in person_scales.items()})
+                    slot += 1
+                    with profile_stage(profiler, "figure_scaling"):
+                        scaled = transform_pose_arrays(
+                            body_np[:, :2], face_np[:, :2], lhand_np[:, :2], rhand_np[:, :2], current_scales, H, W, ground_plane_active,
+                            body_int=body_int, lhand_conf=lhand_np[:, 2], rhand_conf=rhand_np[:, 2], profiler=profiler)
+                    with profile_stage(profiler, "normalization"):
+                        normalized = normalize_pose_arrays(*scaled, W, H) if render_images else None
+                    frame_figures.append((fig_idx, figure, scaled, normalized))
+
+            # 출력 키포인트 객체와 그리기용 정규화 좌표 리스트 조립
+            with profile_stage(profiler, "assembly"):
+                frames.append(assemble_frame(figures, frame_figures, output_W, output_H, render_images))
+        return frames
+
+    assembly_key = stages.key(face_key, hand_key, render_images) if stage_cache is not None else None
+    assembled_frames = stages.run("assembly", assembly_key, assemble_frames)
 
-                scales_to_check = [leg_scale, torso_scale, overall_scale, pelvis_scale, head_scale] 
-                is_scaling_active = any(abs(s - 1.0) > 0.001 for s in scales_to_check)
-                
-                candidate_list_current_fig_np = scaled_candidate_np
-                face_list_current_fig_np = np.array(face_points_scaled_current_fig) if face_points_scaled_current_fig else np.array([])
-                lhand_list_current_fig_np = np.array(lhand_scaled_current_fig) if lhand_scaled_current_fig else np.array([])
-                rhand_list_current_fig_np = np.array(rhand_scaled_current_fig) if rhand_scaled_current_fig else np.array([])
-                
-                if use_ground_plane and is_scaling_active:
-                    ground_y_coord = H
-                    orig_feet_coords = [initial_candidate[i] for i in FEET_INDICES if i < len(initial_candidate)]
-                    orig_lowest_y = max(p[1] for p in orig_feet_coords) if orig_feet_coords else H
-                    orig_dist_to_ground = ground_y_coord - orig_lowest_y
-
-                    feet_coords_for_overall_pivot = [candidate_list_current_fig_np[i] for i in FEET_INDICES if i < len(candidate_list_current_fig_np)]
-                    
-                    if feet_coords_for_overall_pivot:
-                        feet_pos_pivot = np.mean(feet_coords_for_overall_pivot, axis=0)
-                        candidate_list_current_fig_np = np.array([scale(p, overall_scale, feet_pos_pivot) for p in candidate_list_current_fig_np])
-                        if face_list_current_fig_np.size > 0: face_list_current_fig_np = np.array([scale(p, overall_scale, feet_pos_pivot) for p in face_list_current_fig_np])
-                        if lhand_list_current_fig_np.size > 0: lhand_list_current_fig_np = np.array([scale(p, overall_scale, feet_pos_pivot) if np.sum(np.abs(p)) > eps else p for p in lhand_list_current_fig_np])
-                        if rhand_list_current_fig_np.size > 0: rhand_list_current_fig_np = np.array([scale(p, overall_scale, feet_pos_pivot) if np.sum(np.abs(p)) > eps else p for p in rhand_list_current_fig_np])
-
-                        final_feet_coords = [candidate_list_current_fig_np[i] for i in FEET_INDICES if i < len(candidate_list_current_fig_np)]
-                        if final_feet_coords:
-                            final_lowest_y = max(p[1] for p in final_feet_coords)
-                            desired_final_y = ground_y_coord - orig_dist_to_ground
-                            vertical_translation = desired_final_y - final_lowest_y
-                            
-                            candidate_list_current_fig_np = candidate_list_current_fig_np + np.array([0, vertical_translation])
-                            if face_list_current_fig_np.size > 0: face_list_current_fig_np = face_list_current_fig_np + np.array([0, vertical_translation])
-                            if lhand_list_current_fig_np.size > 0: lhand_list_current_fig_np = lhand_list_current_fig_np + np.array([0, vertical_translation])
-                            if rhand_list_current_fig_np.size > 0: rhand_list_current_fig_np = rhand_list_current_fig_np + np.array([0, vertical_translation])
-                else: 
-                    center_pivot = [W * 0.5, H * 0.5]
-                    candidate_list_current_fig_np = np.array([scale(p, overall_scale, center_pivot) for p in candidate_list_current_fig_np])
-                    if face_list_current_fig_np.size > 0: face_list_current_fig_np = np.array([scale(p, overall_scale, center_pivot) for p in face_list_current_fig_np])
-                    if lhand_list_current_fig_np.size > 0: lhand_list_current_fig_np = np.array([scale(p, overall_scale, center_pivot) if np.sum(np.abs(p)) > eps else p for p in lhand_list_current_fig_np])
-                    if rhand_list_current_fig_np.size > 0: rhand_list_current_fig_np = np.array([scale(p, overall_scale, center_pivot) if np.sum(np.abs(p)) > eps else p for p in rhand_list_current_fig_np])
-                
-                body_kps_out_current_fig = [item for i, p in enumerate(candidate_list_current_fig_np) for item in [p[0], p[1], confidence_scores_body[i]]]
-                face_kps_out_current_fig = [item for p in face_list_current_fig_np for item in [p[0], p[1], 1.0]] if face_list_current_fig_np.size > 0 else []
-                
-                original_lhand_confidences = [lhand_raw[i+2] for i in range(0, len(lhand_raw), 3)] if lhand_raw else []
-                original_rhand_confidences = [rhand_raw[i+2] for i in range(0, len(rhand_raw), 3)] if rhand_raw else []
-                
-                lhand_kps_out_current_fig = [item for i, p in enumerate(lhand_list_current_fig_np) for item in [p[0], p[1], original_lhand_confidences[i]]] if lhand_list_current_fig_np.size > 0 else []
-                rhand_kps_out_current_fig = [item for i, p in enumerate(rhand_list_current_fig_np) for item in [p[0], p[1], original_rhand_confidences[i]]] if rhand_list_current_fig_np.size > 0 else []
-                
-                current_image_people_data_for_output.append({
-                    "pose_keypoints_2d": body_kps_out_current_fig, "face_keypoints_2d": face_kps_out_current_fig,
-                    "hand_left_keypoints_2d": lhand_kps_out_current_fig, "hand_right_keypoints_2d": rhand_kps_out_current_fig,
-                })
-
-                all_scaled_candidates_for_drawing.extend(candidate_list_current_fig_np.tolist())
-                if face_list_current_fig_np.size > 0: all_scaled_faces_for_drawing.extend(face_list_current_fig_np.tolist())
-                if lhand_list_current_fig_np.size > 0: all_scaled_hands_for_drawing.append(lhand_list_current_fig_np.tolist())
-                if rhand_list_current_fig_np.size > 0: all_scaled_hands_for_drawing.append(rhand_list_current_fig_np.tolist())
-
-                if fig_idx == 0 and not final_subset_for_drawing[0]:
-                    final_subset_for_drawing[0].extend([i if body_raw[i*3+2]>0 else -1 for i in range(len(candidate_list_current_fig_np))])
-                else:
-                    prev_candidate_count = len(all_scaled_candidates_for_drawing) - len(candidate_list_current_fig_np)
-                    final_subset_for_drawing.append([prev_candidate_count+i if body_raw[i*3+2]>0 else -1 for i in range(len(candidate_list_current_fig_np))])
-            
-            current_frame_keypoint_object = { "people": current_image_people_data_for_output, "canvas_width": output_W, "canvas_height": output_H }
-            all_frames_keypoints_output.append(current_frame_keypoint_object)
-            
-            candidate_norm, faces_norm = all_scaled_candidates_for_drawing, all_scaled_faces_for_drawing
-            hands_norm_for_drawing = all_scaled_hands_for_drawing 
-            
-            if candidate_norm:
-                candidate_np_norm = np.array(candidate_norm).astype(float); candidate_np_norm[...,0] /= float(W); candidate_np_norm[...,1] /= float(H)
-                candidate_norm = candidate_np_norm.tolist()
-            if faces_norm: 
-                faces_np_norm = np.array(faces_norm).astype(float); 
-                if faces_np_norm.size > 0: faces_np_norm[...,0] /= float(W); faces_np_norm[...,1] /= float(H)
-                faces_norm = faces_np_norm.tolist()
-            
-            hands_final_norm_for_drawing = []
-            if hands_norm_for_drawing: 
-                for hand_kps_list in hands_norm_for_drawing:
-                    current_normalized_hand = []
-                    for point_list in hand_kps_list: 
-                        if not isinstance(point_list, (list, np.ndarray)) or len(point_list) != 2: continue 
-                        norm_point = np.array(point_list).astype(float)
-                        if norm_point[0] > eps or norm_point[1] > eps:
-                            norm_point[0] /= float(W)
-                            norm_point[1] /= float(H)
-                        current_normalized_hand.append(norm_point.tolist())
-                    if current_normalized_hand : hands_final_norm_for_drawing.append(current_normalized_hand)
-            
-            bodies = dict(candidate=candidate_norm, subset=final_subset_for_drawing)
-            original_face_exists = any(fig.get('face_keypoints_2d') for fig in figures)
-            original_lhand_exists = any(fig.get('hand_left_keypoints_2d') for fig in figures)
-            original_rhand_exists = any(fig.get('hand_right_keypoints_2d') for fig in figures)
-
-            pose = dict(
-                bodies=bodies if show_body else {'candidate':[], 'subset':[]}, 
-                faces=faces_norm if show_face and original_face_exists else [], 
-                hands=hands_final_norm_for_drawing if show_hands and (original_lhand_exists or original_rhand_exists) else []
-            )
-            W_scaled = resolution_x if resolution_x >= 64 else W
-            H_scaled = int(H*(W_scaled*1.0/W))
-            pose_imgs.append(draw_pose(pose, H_scaled, W_scaled, pose_marker_size, face_marker_size, hand_marker_size))
+    pose_imgs = []
+    all_frames_keypoints_output = [frame[0] for frame in assembled_frames if frame is not None]
+
+    # 모든 프레임의 출력 크기가 같으면 결과 배열을 한 번에 할당해 두고 각 프레임을 그 안에 기록한다
+    # render_images=False면 키포인트만 계산하고 캔버스는 할당하지도 그리지도 않는다
+    render_sizes = [get_render_size(frame_dims[frame_idx], resolution_x, preview_width) for frame_idx, frame in enumerate(assembled_frames) if frame is not None] if render_images else []
+    output_batch = None
+    if len(set(render_sizes)) == 1:
+        output_batch = (np.zeros if output_dtype == np.uint8 else np.empty)((len(render_sizes),) + render_sizes[0] + (3,), dtype=output_dtype)
+    render_pool = get_render_pool(render_workers) if render_images and render_workers != 1 else None
+
+    for frame_idx, frame in enumerate(assembled_frames):
+        if frame is None or not render_images:
             pbar.update(1)
+            continue
+        drawing = frame[1]
+
+        pose = dict(
+            bodies=drawing["bodies"] if show_body else {'candidate':[], 'subset':[]}, 
+            faces=drawing["faces"] if show_face and drawing["face_exists"] else [], 
+            hands=drawing["hands"] if show_hands and drawing["hands_exist"] else []
+        )
+        H_scaled, W_scaled = get_render_size(frame_dims[frame_idx], resolution_x, preview_width)
+        marker_factor = W_scaled / get_render_size(frame_dims[frame_idx], resolution_x)[1]
+        marker_sizes = [scale_marker_size(size, marker_factor) for size in (pose_marker_size, face_marker_size, hand_marker_size)]
+        if output_batch is not None: out = output_batch[len(pose_imgs)]
+        else: out = None if output_dtype == np.uint8 else np.empty((H_scaled, W_scaled, 3), dtype=output_dtype)
+        if render_pool is None:
+            with profile_stage(profiler, "raster"):
+                pose_imgs.append(render_pose_frame(pose, H_scaled, W_scaled, *marker_sizes, out=out, use_stamp_cache=use_stamp_cache))
+            pbar.update(1)
+        else:
+            pose_imgs.append(render_pool.submit(render_pose_frame, pose, H_scaled, W_scaled, *marker_sizes, out=out, use_stamp_cache=use_stamp_cache))
+
+    if render_pool is not None:
+        # 프레임 순서대로 결과를 모아 진행률 갱신 순서를 결정적으로 유지한다
+        # 워커 스레드에서 그리는 동안 다른 단계와 겹친 시간은 빠지고, 남은 대기 시간만 raster로 기록된다
+        rendered_imgs = []
+        for future in pose_imgs:
+            with profile_stage(profiler, "raster"):
+                rendered_imgs.append(future.result())
+            pbar.update(1)
+        pose_imgs = rendered_imgs
+
+    # float 출력은 프레임 리스트 대신 미리 할당된 배치 배열을 그대로 돌려준다
+    if output_batch is not None and output_dtype != np.uint8: pose_imgs = output_batch
 
     return pose_imgs, all_frames_keypoints_output
 
-def draw_pose(pose, H, W, pose_marker_size, face_marker_size, hand_marker_size):
-    canvas = np.zeros(shape=(H, W, 3), dtype=np.uint8)
+def render_pose_frame(pose, H, W, pose_marker_size, face_marker_size, hand_marker_size, out=None, use_stamp_cache=False):
+    """
+    Draw one frame into out when given. uint8 buffers are drawn on directly; float buffers receive
+    the image scaled to 0-1, so a batch can be filled without an intermediate uint8 copy of it.
+    """
+    if out is None or out.dtype == np.uint8:
+        return draw_pose(pose, H, W, pose_marker_size, face_marker_size, hand_marker_size, canvas=out, use_stamp_cache=use_stamp_cache)
+    np.divide(draw_pose(pose, H, W, pose_marker_size, face_marker_size, hand_marker_size, use_stamp_cache=use_stamp_cache), 255, out=out, dtype=out.dtype)
+    return out
+
+def draw_pose(pose, H, W, pose_marker_size, face_marker_size, hand_marker_size, canvas=None, use_stamp_cache=False):
+    if canvas is None: canvas = np.zeros(shape=(H, W, 3), dtype=np.uint8)
     body_render_info = pose.get('bodies', {})
     candidate = body_render_info.get('candidate', [])
     subset = body_render_info.get('subset', [])
     faces_data = pose.get('faces', []) 
     hands_data = pose.get('hands', [])
 
-    if candidate and subset and np.array(candidate).size > 0 : canvas = draw_bodypose(canvas, np.array(candidate), np.array(subset), pose_marker_size)
+    if candidate and subset and np.array(candidate).size > 0 : canvas = draw_bodypose(canvas, np.array(candidate), np.array(subset), pose_marker_size, use_stamp_cache)
     if hands_data and np.array(hands_data).size > 0 : canvas = draw_handpose(canvas, hands_data, hand_marker_size)
-    if faces_data and np.array(faces_data).size > 0 : canvas = draw_facepose(canvas, faces_data, face_marker_size)
+    if faces_data and np.array(faces_data).size > 0 : canvas = draw_facepose(canvas, faces_data, face_marker_size, use_stamp_cache)
     return canvas
 
-def draw_bodypose(canvas, candidate, subset, pose_marker_size):
+BODY_LIMB_SEQ = [[1, 2], [1, 5], [2, 3], [3, 4], [5, 6], [6, 7], [1, 8], [8, 9], [9, 10], [1, 11], [11, 12], [12, 13], [1, 0], [0, 14], [14, 16], [0, 15], [15, 17]]
+BODY_COLORS = [[255, 0, 0], [255, 85, 0], [255, 170, 0], [255, 255, 0], [170, 255, 0], [85, 255, 0], [0, 255, 0], [0, 255, 85], [0, 255, 170], [0, 255, 255], [0, 170, 255], [0, 85, 255], [0, 0, 255], [85, 0, 255], [170, 0, 255], [255, 0, 255], [255, 0, 170], [255, 0, 85]]
+BODY_COLORS_NP = np.array(BODY_COLORS)
+
+HAND_EDGES = [[0, 1], [1, 2], [2, 3], [3, 4], [0, 5], [5, 6], [6, 7], [7, 8], [0, 9], [9, 10], [10, 11], [11, 12], [0, 13], [13, 14], [14, 15], [15, 16], [0, 17], [17, 18], [18, 19], [19, 20]]
+HAND_KEYPOINT_COLOR = (0, 0, 255)
+FACE_KEYPOINT_COLOR = (255, 255, 255)
+
+def _hue_to_rgb(hue):
+    """RGB (0-255 floats) of a fully saturated, full value hue, computed like matplotlib.colors.hsv_to_rgb."""
+    i = int(hue * 6.0)
+    f = (hue * 6.0) - i
+    q, t = 1.0 - f, 1.0 - (1.0 - f)
+    rgb = [(1.0, t, 0.0), (q, 1.0, 0.0), (0.0, 1.0, t), (0.0, q, 1.0), (t, 0.0, 1.0), (1.0, 0.0, q)][i % 6]
+    return tuple(c * 255 for c in rgb)
+
+# 손가락 뼈대마다 색상환을 균등하게 나눈 색 (프레임마다 hsv 변환을 반복하지 않도록 미리 계산)
+HAND_EDGE_COLORS = [_hue_to_rgb(ie / float(len(HAND_EDGES))) for ie in range(len(HAND_EDGES))]
+
+# --- 스탬프 캐시: 반복해서 그려지는 도형을 한 번만 래스터화해 둔다 ---
+# 팔다리 윤곽은 (길이, 마커 크기, 각도)마다 달라 종류가 끝없이 늘어나므로 최근 것만 유지한다
+_limb_polygon_cache = LRUCache(1024) # 윤곽 하나를 1로 센다
+_disc_stamp_cache = {}
+
+def get_limb_polygon(half_length, marker_size, angle):
+    """cv2.ellipse2Poly outline of a limb centred on the origin, memoized per (length, marker size, angle)."""
+    key = (half_length, marker_size, angle)
+    polygon = _limb_polygon_cache.get(key)
+    if polygon is None:
+        polygon = cv2.ellipse2Poly((0, 0), (half_length, marker_size), angle, 0, 360, 1)
+        _limb_polygon_cache.put(key, polygon, 1)
+    return polygon
+
+def get_disc_stamp(radius):
+    """Pixel offsets (dy, dx) covered by a filled cv2.circle of the given radius, memoized per radius."""
+    stamp = _disc_stamp_cache.get(radius)
+    if stamp is None:
+        mask = np.zeros((2 * radius + 1, 2 * radius + 1), dtype=np.uint8)
+        cv2.circle(mask, (radius, radius), radius, 1, thickness=-1)
+        dy, dx = np.nonzero(mask)
+        stamp = _disc_stamp_cache[radius] = (dy - radius, dx - radius)
+    return stamp
+
+def stamp_discs(canvas, centers, colors, radius):
+    """
+    Blit filled discs at integer (x, y) centers in one pass. Where discs overlap, the later one wins,
+    the same as drawing them with successive cv2.circle calls.
+    """
+    if len(centers) == 0: return canvas
+    H, W, C = canvas.shape
+    dy, dx = get_disc_stamp(radius)
+    ys, xs = (centers[:, 1:2] + dy).ravel(), (centers[:, 0:1] + dx).ravel()
+    colors = np.broadcast_to(np.asarray(colors, dtype=canvas.dtype).reshape(-1, C), (len(centers), C))
+    pixel_colors = np.repeat(colors, len(dy), axis=0)
+    inside = (ys >= 0) & (ys < H) & (xs >= 0) & (xs < W)
+    ys, xs, pixel_colors = ys[inside], xs[inside], pixel_colors[inside]
+    _, last_from_end = np.unique((ys * W + xs)[::-1], return_index=True)
+    last = len(ys) - 1 - last_from_end
+    canvas[ys[last], xs[last]] = pixel_colors[last]
+    return canvas
+
+def draw_bodypose_stamped(canvas, candidate, subset, pose_marker_size):
+    """draw_bodypose with limb geometry computed for all persons at once, cached limb polygons and stamped joints."""
+    H, W, C = canvas.shape
+    if candidate.ndim != 2 or candidate.shape[1] != 2 or subset.ndim != 2: return canvas
+    subset = subset.astype(int)
+    limb_ids = [i for i, limb in enumerate(BODY_LIMB_SEQ) if max(limb) < subset.shape[1]]
+    if limb_ids:
+        index = subset[:, [BODY_LIMB_SEQ[i] for i in limb_ids]].transpose(1, 0, 2) # (limbs, persons, 2)
+        valid = (index != -1).all(axis=-1) & (index.max(axis=-1) < len(candidate))
+        points = candidate[np.where(valid[..., None], index, 0)]
+        Y, X = points[..., 0] * float(W), points[..., 1] * float(H)
+        mX, mY = (X[..., 0] + X[..., 1]) / 2, (Y[..., 0] + Y[..., 1]) / 2
+        delta = np.stack([X[..., 0] - X[..., 1], Y[..., 0] - Y[..., 1]], axis=-1)
+        length = np.sqrt(_rowdot(delta, delta))
+        angle = np.degrees(np.arctan2(delta[..., 0], delta[..., 1]))
+        for limb_pos, n in zip(*np.nonzero(valid & (length >= 1))):
+            polygon = get_limb_polygon(int(length[limb_pos, n] / 2), pose_marker_size, int(angle[limb_pos, n])) + (int(mY[limb_pos, n]), int(mX[limb_pos, n]))
+            cv2.fillConvexPoly(canvas, polygon, BODY_COLORS[limb_ids[limb_pos] % len(BODY_COLORS)])
+    valid = (subset != -1) & (subset < len(candidate))
+    person_idx, joint_idx = np.nonzero(valid)
+    points = candidate[subset[person_idx, joint_idx]]
+    centers = np.stack([(points[:, 0] * W).astype(int), (points[:, 1] * H).astype(int)], axis=-1)
+    return stamp_discs(canvas, centers, BODY_COLORS_NP[joint_idx % len(BODY_COLORS)], pose_marker_size)
+
+def draw_bodypose(canvas, candidate, subset, pose_marker_size, use_stamp_cache=False):
+    if use_stamp_cache: return draw_bodypose_stamped(canvas, candidate, subset, pose_marker_size)
     H, W, C = canvas.shape
-    limbSeq = [[1, 2], [1, 5], [2, 3], [3, 4], [5, 6], [6, 7], [1, 8], [8, 9], [9, 10], [1, 11], [11, 12], [12, 13], [1, 0], [0, 14], [14, 16], [0, 15], [15, 17]]
-    colors = [[255, 0, 0], [255, 85, 0], [255, 170, 0], [255, 255, 0], [170, 255, 0], [85, 255, 0], [0, 255, 0], [0, 255, 85], [0, 255, 170], [0, 255, 255], [0, 170, 255], [0, 85, 255], [0, 0, 255], [85, 0, 255], [170, 0, 255], [255, 0, 255], [255, 0, 170], [255, 0, 85]]
+    limbSeq, colors = BODY_LIMB_SEQ, BODY_COLORS
     if candidate.ndim != 2 or candidate.shape[1] != 2: return canvas 
     for i in range(len(limbSeq)):
         for n in range(len(subset)):
@@ -582,31 +958,34 @@ def draw_bodypose(canvas, candidate, subset, pose_marker_size):
 
 def draw_handpose(canvas, all_hand_peaks, hand_marker_size):
     H, W, C = canvas.shape
-    edges = [[0, 1], [1, 2], [2, 3], [3, 4], [0, 5], [5, 6], [6, 7], [7, 8], [0, 9], [9, 10], [10, 11], [11, 12], [0, 13], [13, 14], [14, 15], [15, 16], [0, 17], [17, 18], [18, 19], [19, 20]]
     for peaks_list_for_one_hand in all_hand_peaks:
         peaks_np = np.array(peaks_list_for_one_hand)
         if peaks_np.ndim != 2 or peaks_np.shape[1] != 2: continue
-        for ie, e in enumerate(edges):
-            if e[0] >= len(peaks_np) or e[1] >= len(peaks_np): continue
-            x1_coord, y1_coord = peaks_np[e[0]] 
-            x2_coord, y2_coord = peaks_np[e[1]]
+        peaks = peaks_np.tolist() # 점 단위 접근은 numpy 스칼라보다 파이썬 float가 훨씬 빠르다
+        for e, color in zip(HAND_EDGES, HAND_EDGE_COLORS):
+            if e[0] >= len(peaks) or e[1] >= len(peaks): continue
+            x1_coord, y1_coord = peaks[e[0]]
+            x2_coord, y2_coord = peaks[e[1]]
             if x1_coord < eps and y1_coord < eps or x2_coord < eps and y2_coord < eps: continue
             x1, y1 = int(x1_coord * W), int(y1_coord * H)
             x2, y2 = int(x2_coord * W), int(y2_coord * H)
             if x1 > eps and y1 > eps and x2 > eps and y2 > eps:
-                cv2.line(canvas, (x1, y1), (x2, y2), matplotlib.colors.hsv_to_rgb([ie / float(len(edges)), 1.0, 1.0]) * 255, thickness=max(1, hand_marker_size))
-        for i, keyponit in enumerate(peaks_np):
-            x_coord, y_coord = keyponit
+                cv2.line(canvas, (x1, y1), (x2, y2), color, thickness=max(1, hand_marker_size))
+        for x_coord, y_coord in peaks:
             x, y = int(x_coord * W), int(y_coord * H)
-            if x > eps and y > eps: cv2.circle(canvas, (x, y), max(1, hand_marker_size) + 1, (0, 0, 255), thickness=-1)
+            if x > eps and y > eps: cv2.circle(canvas, (x, y), max(1, hand_marker_size) + 1, HAND_KEYPOINT_COLOR, thickness=-1)
     return canvas
 
-def draw_facepose(canvas, all_lmks, face_marker_size):
+def draw_facepose(canvas, all_lmks, face_marker_size, use_stamp_cache=False):
     H, W, C = canvas.shape
     lmks_np = np.array(all_lmks) 
     if lmks_np.ndim != 2 or lmks_np.shape[1] != 2: return canvas
+    if use_stamp_cache:
+        centers = np.stack([(lmks_np[:, 0] * W).astype(int), (lmks_np[:, 1] * H).astype(int)], axis=-1)
+        centers = centers[(centers[:, 0] > eps) & (centers[:, 1] > eps)]
+        return stamp_discs(canvas, centers, FACE_KEYPOINT_COLOR, face_marker_size)
     for lmk in lmks_np:
         x_coord, y_coord = lmk
         x, y = int(x_coord * W), int(y_coord * H)
-        if x > eps and y > eps: cv2.circle(canvas, (x, y), face_marker_size, (255, 255, 255), thickness=-1)
+        if x > eps and y > eps: cv2.circle(canvas, (x, y), face_marker_size, FACE_KEYPOINT_COLOR, thickness=-1)
     return canvas